@@ -1,9 +1,176 @@
 # -*- coding: utf-8 -*
 
-import biosppy
+from fractions import Fraction
+from functools import lru_cache
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
+from ABP.backends import lazy_import
+
+biosppy = lazy_import("biosppy")
+ss = lazy_import("scipy.signal")
+
+
+def resample(signal, sampling_rate, target_rate):
+    """
+    Resamples the signal with scipy's anti-aliased polyphase filter.
+
+    Parameters
+    ----------
+    signal : array
+        The signal.
+    sampling_rate : float
+        The sampling rate of the signal [Hz].
+    target_rate : float
+        The requested sampling rate [Hz].
+
+    Returns
+    -------
+    array: The signal at the target rate.
+
+    Raises
+    ------
+    None
+
+    """
+    ratio = Fraction(target_rate / sampling_rate).limit_denominator(1000)
+    if ratio == 1:
+        return np.asarray(signal, dtype=np.float64)
+    return ss.resample_poly(np.asarray(signal, dtype=np.float64), ratio.numerator, ratio.denominator,
+                            padtype='line')
+
+
+class FilterBank:
+    """
+    This class designs filters once and applies them forward-backward.
+
+    Coefficients are cached by (type, band, order, frequency, sampling rate).
+    Forward-backward FIR filtering is a single convolution with b and reversed b;
+    long inputs with long kernels use overlap-add FFT convolution, which is
+    faster from about 255 kernel taps (see benchmarks/bench_filter.py).
+
+    Methods
+    -------
+    coefficients(ftype, band, order, frequency, sampling_rate)
+        Returns the cached filter coefficients.
+    filter(signal, ftype, band, order, frequency, sampling_rate, method)
+        Filters the signal like biosppy.signals.tools.filter_signal.
+    """
+
+    FFT_MIN_KERNEL = 255
+    FFT_MIN_LENGTH = 10000
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _design(ftype, band, order, frequency, sampling_rate):
+        b, a = biosppy.signals.tools.get_filter(
+            ftype=ftype,
+            band=band,
+            order=order,
+            frequency=list(frequency) if isinstance(frequency, tuple) else frequency,
+            sampling_rate=sampling_rate,
+        )
+        b, a = np.asarray(b, dtype=np.float64), np.asarray(a, dtype=np.float64)
+        b.flags.writeable = False
+        a.flags.writeable = False
+        return b, a
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _zero_phase_kernel(ftype, band, order, frequency, sampling_rate):
+        b, _ = FilterBank._design(ftype, band, order, frequency, sampling_rate)
+        kernel = np.convolve(b, b[::-1])
+        kernel.flags.writeable = False
+        return kernel
+
+    @staticmethod
+    def _key(frequency, sampling_rate):
+        frequency = tuple(float(f) for f in np.atleast_1d(frequency))
+        return (frequency if len(frequency) > 1 else frequency[0]), float(sampling_rate)
+
+    @classmethod
+    def coefficients(cls, ftype, band, order, frequency, sampling_rate):
+        """
+        Returns the filter coefficients, designing them only on the first call.
+
+        Parameters
+        ----------
+        ftype : str
+            Filter type, as in biosppy ('FIR', 'butter', ...).
+        band : str
+            Band type ('lowpass', 'highpass', 'bandpass', 'bandstop').
+        order : int
+            Order of the filter.
+        frequency : float or list
+            Cutoff frequencies [Hz].
+        sampling_rate : float
+            Sampling frequency [Hz].
+
+        Returns
+        -------
+        tuple[array, array]: Read-only numerator and denominator coefficients.
+
+        Raises
+        ------
+        None
+
+        """
+        return cls._design(ftype, band, int(order), *cls._key(frequency, sampling_rate))
+
+    @classmethod
+    def filter(cls, signal, ftype, band, order, frequency, sampling_rate, method='auto'):
+        """
+        Filters the signal forward-backward with the cached coefficients.
+
+        Parameters
+        ----------
+        signal : array
+            The signal.
+        ftype : str
+            Filter type, as in biosppy ('FIR', 'butter', ...).
+        band : str
+            Band type ('lowpass', 'highpass', 'bandpass', 'bandstop').
+        order : int
+            Order of the filter.
+        frequency : float or list
+            Cutoff frequencies [Hz].
+        sampling_rate : float
+            Sampling frequency [Hz].
+        method : str
+            'direct', 'fft' or 'auto' convolution of FIR filters.
+
+        Returns
+        -------
+        array: The filtered signal, equal to scipy.signal.filtfilt within rounding.
+
+        Raises
+        ------
+        ValueError
+            If the signal is not longer than the filtfilt padding.
+
+        """
+        signal = np.asarray(signal, dtype=np.float64)
+        b, a = cls.coefficients(ftype, band, order, frequency, sampling_rate)
+        if ftype != 'FIR':
+            return ss.filtfilt(b, a, signal)
+
+        kernel = cls._zero_phase_kernel(ftype, band, int(order), *cls._key(frequency, sampling_rate))
+        taps = len(b)
+        padlen = 3 * taps
+        if len(signal) <= padlen:
+            raise ValueError(f"The length of the input vector x must be greater than padlen, which is {padlen}.")
+
+        # filtfilt's odd extension, only the part reaching the output
+        extended = np.concatenate((
+            2 * signal[0] - signal[taps - 1:0:-1],
+            signal,
+            2 * signal[-1] - signal[-2:-taps - 1:-1],
+        ))
+
+        if method == 'auto':
+            long_input = len(signal) >= cls.FFT_MIN_LENGTH
+            method = 'fft' if long_input and len(kernel) >= cls.FFT_MIN_KERNEL else 'direct'
+        if method == 'fft':
+            return ss.oaconvolve(extended, kernel, mode='valid')
+        return np.convolve(kernel, extended, mode='valid')
 
 
 class SignalPreprocessing:
@@ -21,9 +188,14 @@ class SignalPreprocessing:
     ----------
     signal : array
         The preprocessed signal.
+    sampling_rate : int
+        The sampling rate of the preprocessed signal [Hz].
 
     Methods
     -------
+    resample()
+        Decimates the signal to the analysis rate.
+
     filter()
         Removes noise from the signal.
         
@@ -32,11 +204,82 @@ class SignalPreprocessing:
 
     """
 
-    def __init__(self, signal):
+    # filter order and smoother size at SAMPLING_RATE, scaled for other rates
+    FILTER_ORDER = int(0.3 * 100)
+    FILTER_FREQUENCY = [0.5, 40]
+    SAMPLING_RATE = 200
+    SMOOTHER_SIZE = int(0.1 * 100)
+
+    def __init__(self, signal, sampling_rate=SAMPLING_RATE, analysis_rate=None):
+        """
+        Parameters
+        ----------
+        signal : array
+            The raw signal.
+        sampling_rate : int
+            The sampling rate of the raw signal [Hz].
+        analysis_rate : int, optional
+            The rate the signal is decimated to before filtering [Hz].
+            None keeps the sampling rate.
+
+        Returns
+        -------
+        None
+        """
         self.signal = signal
+        self.sampling_rate = sampling_rate
+        self.analysis_rate = sampling_rate if analysis_rate is None else analysis_rate
+        self.resample()
         self.filter()
         self.remove_offsets()
 
+    @classmethod
+    def parameters(cls, sampling_rate):
+        """
+        Returns the filter order and smoother size for the given rate.
+
+        Parameters
+        ----------
+        sampling_rate : int
+            The sampling rate [Hz].
+
+        Returns
+        -------
+        tuple[int, int]: The FIR order and the smoother size.
+
+        Raises
+        ------
+        None
+
+        """
+        scale = sampling_rate / cls.SAMPLING_RATE
+        return int(round(cls.FILTER_ORDER * scale)), max(int(round(cls.SMOOTHER_SIZE * scale)), 1)
+
+    def resample(self):
+        """
+        Decimates the signal to the analysis rate with an anti-aliased polyphase filter.
+
+        Parameters
+        ----------
+        self : SignalPreprocessing
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            If the analysis rate can not keep the filter band.
+
+        """
+        if self.analysis_rate == self.sampling_rate:
+            return
+        if self.analysis_rate <= 2 * max(self.FILTER_FREQUENCY):
+            raise ValueError("Invalid analysis rate.")
+        self.signal = resample(self.signal, self.sampling_rate, self.analysis_rate)
+        self.sampling_rate = self.analysis_rate
+
     def filter(self):
         """
         Removes noise from the signal.
@@ -54,13 +297,19 @@ class SignalPreprocessing:
         None
 
         """
-        self.signal = biosppy.signals.tools.filter_signal(
+        order, _ = self.parameters(self.sampling_rate)
+        filtered = FilterBank.filter(
             signal=self.signal,
             ftype='FIR',
             band='bandpass',
-            order=int(0.3 * 100),
-            frequency=[0.5, 40],
-            sampling_rate=200,
+            order=order,
+            frequency=self.FILTER_FREQUENCY,
+            sampling_rate=self.sampling_rate,
+        )
+        self.signal = biosppy.utils.ReturnTuple(
+            (filtered, self.sampling_rate, {"ftype": 'FIR', "order": order,
+                                            "frequency": self.FILTER_FREQUENCY, "band": 'bandpass'}),
+            ("signal", "sampling_rate", "params"),
         )
 
     def remove_offsets(self):
@@ -83,13 +332,192 @@ class SignalPreprocessing:
         self.signal = biosppy.signals.tools.smoother(
             signal=self.signal[0],
             kernel='boxzen',
-            size=int(0.1 * 100),
+            size=self.parameters(self.sampling_rate)[1],
             mirror=True,
             show=False,
         )
 
 
+class _StreamingConvolution:
+    """
+    This class convolves a padded stream with a kernel chunk by chunk.
+
+    The result equals np.convolve(kernel, padded, 'full')[skip:skip + n] where
+    padded is the whole input with `pad` samples added on both sides, either as
+    an odd extension ('odd', like scipy.signal.filtfilt) or as repeated edge
+    values ('constant', like biosppy's mirrored smoother). Only the last
+    len(kernel) - 1 padded samples and the last pad + 1 input samples are kept.
+    """
+
+    def __init__(self, kernel, skip, pad, mode):
+        self.kernel = np.asarray(kernel, dtype=np.float64)
+        self.skip = skip
+        self.pad = pad
+        self.mode = mode
+        self._head = np.empty(0)
+        self._history = np.zeros(len(self.kernel) - 1)
+        self._tail = np.empty(0)
+        self._started = False
+        self._received = 0
+        self._produced = 0
+        self._emitted = 0
+
+    def _convolve(self, padded):
+        if len(padded) == 0:
+            # np.convolve would swap the arguments of a shorter 'valid' input
+            return padded
+        data = np.concatenate((self._history, padded))
+        self._history = data[len(data) - len(self._history):]
+        full = np.convolve(self.kernel, data, mode='valid')
+        first = max(self.skip - self._produced, 0)
+        self._produced += len(full)
+        out = full[first:]
+        self._emitted += len(out)
+        return out
+
+    def _left_padding(self, head):
+        if self.mode == 'odd':
+            return 2 * head[0] - head[self.pad:0:-1]
+        return np.full(self.pad, head[0])
+
+    def push(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        self._received += len(chunk)
+        self._tail = np.concatenate((self._tail, chunk))[-(self.pad + 1):]
+        if not self._started:
+            self._head = np.concatenate((self._head, chunk))
+            needed = self.pad + 1 if self.mode == 'odd' else 1
+            if len(self._head) < needed:
+                return np.empty(0)
+            self._started = True
+            chunk, self._head = np.concatenate((self._left_padding(self._head), self._head)), None
+        return self._convolve(chunk)
+
+    def flush(self):
+        if not self._started:
+            raise ValueError(f"The stream must be longer than {self.pad} samples.")
+        last = self._tail[-1]
+        if self.mode == 'odd':
+            right = 2 * last - self._tail[-2::-1]
+        else:
+            right = np.full(self.pad, last)
+        out = np.concatenate((self._convolve(right), self._convolve(np.zeros(len(self.kernel) - 1))))
+        return out[:len(out) - (self._emitted - self._received)]
+
+
+class StreamingSignalPreprocessing:
+    """
+    This class preprocesses a signal delivered in chunks.
+
+    It applies the same FIR band-pass filter and boxzen smoother as
+    SignalPreprocessing, keeping only the state needed across chunk boundaries,
+    so arbitrarily long files and live feeds are filtered in constant memory.
+    The concatenated output of push() and flush() matches
+    SignalPreprocessing(whole_signal).signal[0] to floating point precision.
+    The output lags the input by a few dozen samples.
+
+    Methods
+    -------
+    push(chunk)
+        Filters the next chunk and returns the output available so far.
+    flush()
+        Ends the stream and returns the remaining output.
+
+    """
+
+    def __init__(self, sampling_rate=SignalPreprocessing.SAMPLING_RATE):
+        """
+        Parameters
+        ----------
+        sampling_rate : int
+            The sampling rate of the stream [Hz].
+
+        Returns
+        -------
+        None
+        """
+        order, size = SignalPreprocessing.parameters(sampling_rate)
+        b, _ = FilterBank.coefficients(
+            ftype='FIR',
+            band='bandpass',
+            order=order,
+            frequency=SignalPreprocessing.FILTER_FREQUENCY,
+            sampling_rate=sampling_rate,
+        )
+
+        # forward-backward FIR filtering is one convolution with b and reversed b
+        padlen = 3 * len(b)
+        fir = _StreamingConvolution(np.convolve(b, b[::-1]), padlen + len(b) - 1, padlen, 'odd')
+        smoothing = [
+            _StreamingConvolution(window / window.sum(), size + (size - 1) // 2, size, 'constant')
+            for window in (ss.windows.boxcar(size), ss.windows.parzen(size))
+        ]
+        self._stages = [fir] + smoothing
+
+    def push(self, chunk):
+        """
+        Filters the next chunk.
+
+        Parameters
+        ----------
+        chunk : array
+            The next samples of the signal.
+
+        Returns
+        -------
+        array: The filtered samples available so far.
+
+        Raises
+        ------
+        None
+
+        """
+        for stage in self._stages:
+            chunk = stage.push(chunk)
+        return chunk
+
+    def flush(self):
+        """
+        Ends the stream.
+
+        Parameters
+        ----------
+        self : StreamingSignalPreprocessing
+
+        Returns
+        -------
+        array: The remaining filtered samples.
+
+        Raises
+        ------
+        ValueError
+            If the stream was too short to be filtered.
+
+        """
+        out = np.empty(0)
+        for stage in self._stages:
+            out = np.concatenate((stage.push(out), stage.flush()))
+        return out
+
+
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    # run as python -m ABP._signal_preprocessing: the streaming filter has to
+    # match the whole-signal one for any chunk size
+    rng = np.random.default_rng(0)
+    time = np.arange(20000) / SignalPreprocessing.SAMPLING_RATE
+    signal = 80 + 20 * np.sin(2 * np.pi * 1.2 * time) + rng.normal(size=len(time))
+    expected = SignalPreprocessing(signal).signal[0]
+    for size in (1, 7, 100, 5000):
+        stream = StreamingSignalPreprocessing()
+        chunks = [stream.push(signal[start:start + size]) for start in range(0, len(signal), size)]
+        streamed = np.concatenate(chunks + [stream.flush()])
+        assert len(streamed) == len(expected), (size, len(streamed), len(expected))
+        error = np.max(np.abs(streamed - expected))
+        assert error < 1e-9, (size, error)
+        print(f"chunk size {size} -> max difference {error:.1e}")
+
     signal = np.random.rand(100)
     unfiltered, = plt.plot(signal, color='red')
     plt.show()
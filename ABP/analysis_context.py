@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*
+
+from functools import cached_property
+import numpy as np
+from ABP._signal_preprocessing import SignalPreprocessing as SP
+from ABP.backends import lazy_import
+from ABP.beat_detection import abp_onsets, ecg_r_peaks
+from ABP.intermediate_cache import IntermediateCache
+
+ss = lazy_import("scipy.signal")
+
+
+def select_metrics(metrics, available):
+    """
+    Validates a selection of metrics.
+
+    Parameters
+    ----------
+    metrics : list of str or None
+        The selected metric names, None selects all of them.
+    available : tuple of str
+        The metrics a domain can calculate.
+
+    Returns
+    -------
+    tuple: The selected metrics without duplicates, in the given order.
+
+    Raises
+    ------
+    ValueError
+        If a metric is not available.
+    """
+    if metrics is None:
+        return tuple(available)
+    if isinstance(metrics, str):
+        metrics = [metrics]
+    invalid = [metric for metric in metrics if metric not in available]
+    if invalid:
+        raise ValueError(f"Invalid metric {', '.join(invalid)}.")
+    return tuple(dict.fromkeys(metrics))
+
+
+class AnalysisContext:
+    """
+    This class holds the intermediate results shared by the analysis domains.
+
+    Attributes
+    ----------
+    raw_signal : array
+        The raw signal.
+    sampling_frequency : int
+        The sampling frequency of the raw signal [Hz].
+    analysis_rate : int
+        The sampling frequency of the filtered signal and of every index [Hz].
+    signal_type : str
+        "abp" or "ecg", see signal_type_of().
+    cache : IntermediateCache or None
+        The disk cache of the filtered signal and the beats.
+    filtered_signal : array
+        The filtered and smoothed signal, computed on first use.
+    r_peaks : array
+        Indices of the peaks of the filtered signal, the R-peaks of an ECG,
+        computed on first use.
+    onsets : array
+        Indices of the ABP pulse onsets, computed on first use.
+    beats : array
+        The R-peaks of an ECG or the onsets of an ABP signal.
+    rr_intervals : array
+        Intervals between consecutive peaks [samples], computed on first use.
+    nn_intervals : array
+        Intervals between consecutive beats [ms], computed on first use.
+
+    Every attribute is computed at most once, so one context can be handed to
+    TimeDomain and FrequencyDomain without filtering the signal twice. With a
+    cache the filtered signal, the peaks and the onsets are also kept on disk
+    across runs.
+    """
+
+    SIGNAL_TYPES = ("abp", "ecg")
+    ECG_NAMES = ("ecg", "ekg")
+
+    def __init__(self, signal, sampling_frequency=200, analysis_rate=None, signal_type="abp", cache=None):
+        """
+        Parameters
+        ----------
+        signal : array
+            The raw signal.
+        sampling_frequency : int
+            The sampling frequency of the signal [Hz].
+        analysis_rate : int, optional
+            The rate the signal is decimated to before the analysis [Hz].
+            None keeps the sampling frequency.
+        signal_type : str
+            "abp" or "ecg".
+        cache : IntermediateCache, optional
+            The disk cache of the intermediate results.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            If the signal type is invalid.
+        """
+        if signal_type not in self.SIGNAL_TYPES:
+            raise ValueError("Invalid signal type.")
+        self.raw_signal = signal
+        self.sampling_frequency = int(sampling_frequency)
+        self.analysis_rate = self.sampling_frequency if analysis_rate is None else int(analysis_rate)
+        self.signal_type = signal_type
+        self.cache = cache
+
+    @classmethod
+    def signal_type_of(cls, column_name):
+        """
+        Infers the signal type from a column name, e.g. "ekg__[ekg__]" is an ECG.
+
+        Parameters
+        ----------
+        column_name : str
+            The name of the column of the signal.
+
+        Returns
+        -------
+        str: "ecg" if the name mentions ECG or EKG, "abp" otherwise.
+        """
+        name = str(column_name).lower()
+        return "ecg" if any(ecg in name for ecg in cls.ECG_NAMES) else "abp"
+
+    @classmethod
+    def from_signal(cls, signal, sampling_frequency=200, analysis_rate=None, signal_type="abp"):
+        """
+        Returns the given context or wraps a raw signal in a new one.
+
+        Parameters
+        ----------
+        signal : array or AnalysisContext
+            The raw signal or an existing context.
+        sampling_frequency : int
+            The sampling frequency used for a new context [Hz].
+        analysis_rate : int, optional
+            The analysis rate used for a new context [Hz].
+        signal_type : str
+            The signal type used for a new context.
+
+        Returns
+        -------
+        AnalysisContext
+        """
+        if isinstance(signal, cls):
+            return signal
+        return cls(signal, sampling_frequency, analysis_rate, signal_type)
+
+    @cached_property
+    def raw_digest(self):
+        """
+        Hashes the raw samples for the cache keys.
+
+        Returns
+        -------
+        str: The digest, see IntermediateCache.digest().
+        """
+        return IntermediateCache.digest(self.raw_signal)
+
+    def _cached(self, stage, params, compute):
+        """
+        Looks a stage up in the cache and computes it on a miss.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the intermediate result.
+        params : dict
+            The parameters of the stage besides the rates.
+        compute : callable
+            Computes the result.
+
+        Returns
+        -------
+        array: The result.
+        """
+        if self.cache is None:
+            return compute()
+        params = dict(params, sampling_frequency=self.sampling_frequency, analysis_rate=self.analysis_rate)
+        return self.cache.get_or_compute(self.cache.key(self.raw_digest, stage, params), compute)
+
+    @cached_property
+    def filtered_signal(self):
+        """
+        Decimates and filters the raw signal with SignalPreprocessing.
+
+        Returns
+        -------
+        array: The filtered signal at the analysis rate.
+        """
+        params = {"order": SP.FILTER_ORDER, "frequency": SP.FILTER_FREQUENCY, "smoother": SP.SMOOTHER_SIZE}
+        return self._cached(
+            "filtered_signal",
+            params,
+            lambda: SP(self.raw_signal, self.sampling_frequency, self.analysis_rate).signal[0],
+        )
+
+    @cached_property
+    def r_peaks(self):
+        """
+        Finds the R-peaks of an ECG with the Pan-Tompkins detector, otherwise
+        the peaks of the filtered signal, at most one per second.
+
+        Returns
+        -------
+        array: Indices of the peaks.
+        """
+        def detect():
+            if self.signal_type == "ecg":
+                return ecg_r_peaks(self.filtered_signal, self.analysis_rate)
+            return ss.find_peaks(self.filtered_signal, distance=self.analysis_rate)[0]
+
+        return self._cached("r_peaks", {"signal_type": self.signal_type}, detect)
+
+    @cached_property
+    def onsets(self):
+        """
+        Finds the ABP pulse onsets of the filtered signal with the native detector.
+
+        Returns
+        -------
+        array: Indices of the onsets.
+        """
+        return self._cached("onsets", {}, lambda: abp_onsets(self.filtered_signal, self.analysis_rate))
+
+    @property
+    def beats(self):
+        """
+        Returns the beats the NN intervals are measured between.
+
+        Returns
+        -------
+        array: The R-peaks of an ECG or the onsets of an ABP signal.
+        """
+        return self.r_peaks if self.signal_type == "ecg" else self.onsets
+
+    @cached_property
+    def rr_intervals(self):
+        """
+        Calculates the intervals between consecutive peaks.
+
+        Returns
+        -------
+        array: The intervals [samples].
+        """
+        return np.diff(self.r_peaks)
+
+    @cached_property
+    def nn_intervals(self):
+        """
+        Calculates the intervals between consecutive beats.
+
+        Returns
+        -------
+        array: The intervals [ms].
+        """
+        return np.diff(self.beats) * 1000 / self.analysis_rate
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*
+import importlib
+
+
+class LazyModule:
+    """
+    This class stands in for a module and imports it on the first attribute access.
+
+    scipy.signal, pandas, biosppy, pyhrv and matplotlib take seconds to import
+    together, while opening the GUI or asking the CLI for --help needs none of
+    them. Modules of the package bind these libraries with lazy_import(), so
+    the cost is paid by the first analysis that actually calls into them.
+
+    Attributes
+    ----------
+    name : str
+        The name of the module.
+    loaded : bool
+        Whether the module has been imported.
+
+    Methods
+    -------
+    load()
+        Imports the module.
+    """
+
+    def __init__(self, name):
+        """
+        Parameters
+        ----------
+        name : str
+            The absolute name of the module, e.g. "scipy.signal".
+
+        Returns
+        -------
+        None
+        """
+        self.name = name
+        self._module = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        """
+        Imports the module.
+
+        Returns
+        -------
+        module: The imported module.
+        """
+        if self._module is None:
+            self._module = importlib.import_module(self.name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        # only called for attributes of the module, the instance attributes are found first
+        return getattr(self.load(), attribute)
+
+    def __repr__(self):
+        return f"<LazyModule {self.name!r} ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+BACKENDS = {}
+
+
+def lazy_import(name):
+    """
+    Registers a module to be imported on first use.
+
+    Parameters
+    ----------
+    name : str
+        The absolute name of the module.
+
+    Returns
+    -------
+    LazyModule: The stand-in of the module, shared by every caller.
+    """
+    if name not in BACKENDS:
+        BACKENDS[name] = LazyModule(name)
+    return BACKENDS[name]
+
+
+def preload(names):
+    """
+    Imports modules ahead of their first use, e.g. before worker processes are forked.
+
+    Parameters
+    ----------
+    names : iterable of str
+        The absolute names of the modules.
+
+    Returns
+    -------
+    None
+    """
+    for name in names:
+        lazy_import(name).load()
+
+
+def loaded_backends():
+    """
+    Lists the registered modules that have been imported.
+
+    Returns
+    -------
+    list of str: The names of the modules.
+    """
+    return [name for name, module in BACKENDS.items() if module.loaded]
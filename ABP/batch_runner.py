@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+from ABP.analysis_context import AnalysisContext, select_metrics
+from ABP.backends import preload
+from ABP.frequency_domain import FrequencyDomain
+from ABP.time_domain import TimeDomain
+
+DOMAINS = ("time", "frequency")
+
+
+def metric_values(result):
+    """
+    Merges the metrics of every domain of a result of analyze_signal.
+
+    Parameters
+    ----------
+    result : dict
+        See analyze_signal.
+
+    Returns
+    -------
+    tuple[dict, str]: Metric name -> value, and the errors as "domain: message" joined by "; ".
+    """
+    values = {}
+    for domain in DOMAINS:
+        if isinstance(result.get(domain), dict):
+            values.update(result[domain])
+    errors = "; ".join(f"{domain}: {error}" for domain, error in (result.get("errors") or {}).items())
+    return values, errors
+
+
+def _domain_metrics(metrics, domain):
+    return None if metrics is None else [metric for metric in metrics if metric in domain.METRICS]
+
+
+def analyze_signal(file_name, column_name, signal, domains, sampling_frequency, window_size, overlap,
+                   analysis_rate=None, frequency_method="pyhrv", metrics=None, cache=None):
+    """
+    Computes the selected domains of a single signal.
+
+    Parameters
+    ----------
+    file_name : str
+        The name of the file of the signal.
+    column_name : str
+        The name of the column of the signal, ECG columns are recognised by
+        AnalysisContext.signal_type_of().
+    signal : array
+        The raw signal.
+    domains : tuple
+        Any of "time" and "frequency".
+    sampling_frequency : int
+        The sampling frequency of the signal [Hz].
+    window_size : int
+        The size of the window.
+    overlap : int
+        The overlap of the window.
+    analysis_rate : int, optional
+        The rate the signal is decimated to before the analysis [Hz].
+    frequency_method : str
+        The PSD backend of FrequencyDomain.
+    metrics : list of str, optional
+        The parameters to calculate, every domain gets the ones it knows.
+        All parameters of the selected domains if None.
+    cache : IntermediateCache, optional
+        The disk cache of the filtered signal and the beats.
+
+    Returns
+    -------
+    dict
+        file_name, column_name, one entry per domain with its parameters (None on failure)
+        and errors with the exception message of every failed domain. With a cache
+        also cache with the hits and misses of this signal.
+    """
+    result = {"file_name": file_name, "column_name": column_name, "errors": {}}
+    signal_type = AnalysisContext.signal_type_of(column_name)
+    context = AnalysisContext(signal, sampling_frequency, analysis_rate, signal_type, cache)
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    for domain in domains:
+        try:
+            if domain == "time":
+                values = TimeDomain(context, sampling_frequency, metrics=_domain_metrics(metrics, TimeDomain))
+            elif domain == "frequency":
+                values = FrequencyDomain(context, sampling_frequency, window_size, overlap,
+                                         method=frequency_method, metrics=_domain_metrics(metrics, FrequencyDomain))
+            else:
+                raise ValueError(f"Invalid domain {domain}.")
+            result[domain] = dict(values.metrics)
+        except Exception as e:
+            result[domain] = None
+            result["errors"][domain] = str(e)
+    if cache is not None:
+        result["cache"] = {"hits": cache.hits - hits, "misses": cache.misses - misses}
+    return result
+
+
+class BatchRunner:
+    """
+    This class spreads the analysis of many signals over a process pool.
+
+    Attributes
+    ----------
+    domains : tuple
+        Any of "time" and "frequency".
+    sampling_frequency : int
+        The sampling frequency of the signals [Hz].
+    window_size : int
+        The size of the window.
+    overlap : int
+        The overlap of the window.
+    max_workers : int
+        Number of worker processes, 1 runs in the calling process.
+    analysis_rate : int
+        The rate the signals are decimated to before the analysis [Hz].
+    frequency_method : str
+        The PSD backend of FrequencyDomain.
+    metrics : tuple or None
+        The parameters to calculate, None for all of them.
+    cache : IntermediateCache or None
+        The disk cache of the filtered signals and the beats.
+    start_method : str or None
+        The multiprocessing start method of the workers, None for the default.
+    cache_stats : dict
+        The cache hits and misses of every signal analyzed so far.
+
+    Methods
+    -------
+    params
+        The parameters that determine the results.
+    metric_columns
+        The metrics the results hold.
+    backends
+        The modules the selected domains import on first use.
+    imap(items)
+        Yields the results in input order.
+    run(items)
+        Returns the list of results in input order.
+    """
+
+    def __init__(self, domains=("time",), sampling_frequency=200, window_size=256, overlap=128, max_workers=None,
+                 analysis_rate=None, frequency_method="pyhrv", metrics=None, cache=None, start_method=None):
+        """
+        Parameters
+        ----------
+        domains : tuple
+            Any of "time" and "frequency".
+        sampling_frequency : int
+            The sampling frequency of the signals [Hz].
+        window_size : int
+            The size of the window.
+        overlap : int
+            The overlap of the window.
+        max_workers : int
+            Number of worker processes, None uses every core and 1 runs serially.
+        analysis_rate : int, optional
+            The rate the signals are decimated to before the analysis [Hz].
+        frequency_method : str
+            The PSD backend of FrequencyDomain, "pyhrv", "welch", "lomb" or "ar".
+        metrics : list of str, optional
+            The time and frequency domain parameters to calculate, all of them if None.
+        cache : IntermediateCache, optional
+            The disk cache shared by all workers, reruns with unchanged signals
+            skip filtering and beat detection.
+        start_method : str, optional
+            The multiprocessing start method of the workers, e.g. "forkserver"
+            or "spawn" from a process running threads, where forking is unsafe.
+            None uses the default of the platform.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            If a metric is invalid.
+        """
+        self.domains = tuple(domains)
+        self.sampling_frequency = sampling_frequency
+        self.window_size = window_size
+        self.overlap = overlap
+        self.max_workers = max_workers
+        self.analysis_rate = analysis_rate
+        self.frequency_method = frequency_method
+        if metrics is not None:
+            metrics = select_metrics(metrics, TimeDomain.METRICS + FrequencyDomain.METRICS)
+        self.metrics = metrics
+        self.cache = cache
+        self.start_method = start_method
+        self.cache_stats = {"hits": 0, "misses": 0}
+
+    @property
+    def params(self):
+        """
+        Returns the parameters that determine the results, see ResultStore.
+
+        Returns
+        -------
+        dict: The domains, rates, window, PSD backend and metric selection.
+        """
+        return {
+            "domains": list(self.domains),
+            "sampling_frequency": self.sampling_frequency,
+            "window_size": self.window_size,
+            "overlap": self.overlap,
+            "analysis_rate": self.analysis_rate,
+            "frequency_method": self.frequency_method,
+            "metrics": None if self.metrics is None else list(self.metrics),
+        }
+
+    @property
+    def metric_columns(self):
+        """
+        Returns the metrics the results hold, e.g. the columns of a ResultSink.
+
+        Returns
+        -------
+        tuple of str: The selected metrics of the selected domains, time domain first.
+        """
+        available = TimeDomain.METRICS if "time" in self.domains else ()
+        if "frequency" in self.domains:
+            available += FrequencyDomain.METRICS
+        return tuple(metric for metric in available if self.metrics is None or metric in self.metrics)
+
+    @property
+    def backends(self):
+        """
+        Returns the modules the analysis imports on first use.
+
+        Returns
+        -------
+        tuple of str: The module names of the selected domains and PSD backend.
+        """
+        backends = TimeDomain.BACKENDS if "time" in self.domains else ()
+        if "frequency" in self.domains:
+            backends += FrequencyDomain.BACKENDS + FrequencyDomain.METHOD_BACKENDS.get(self.frequency_method, ())
+        return tuple(dict.fromkeys(backends))
+
+    def _arguments(self, item):
+        file_name, column_name, signal = item
+        return (file_name, column_name, signal, self.domains, self.sampling_frequency,
+                self.window_size, self.overlap, self.analysis_rate, self.frequency_method, self.metrics, self.cache)
+
+    def _collect(self, result):
+        for name, count in result.get("cache", {}).items():
+            self.cache_stats[name] += count
+        return result
+
+    def imap(self, items):
+        """
+        Analyzes the signals and yields the results in input order.
+
+        Only a few signals per worker are in flight at once, so a lazy iterator
+        such as PathHandler.iter_signals() is never loaded completely. Closing
+        the generator early cancels the signals that have not started yet.
+
+        Parameters
+        ----------
+        items : iterable
+            (file name, column name, raw signal) tuples.
+
+        Returns
+        -------
+        generator of dict: See analyze_signal.
+        """
+        if self.max_workers == 1:
+            for item in items:
+                yield self._collect(analyze_signal(*self._arguments(item)))
+            return
+
+        in_flight = 2 * (self.max_workers or os.cpu_count() or 1)
+        context = multiprocessing.get_context(self.start_method)
+        if context.get_start_method() == "fork":
+            # forked workers inherit the imported backends instead of each importing them again
+            preload(self.backends)
+        elif context.get_start_method() == "forkserver":
+            # the server imports them once and forks the workers from itself
+            context.set_forkserver_preload(list(self.backends))
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context) as executor:
+            pending = deque()
+            try:
+                for item in items:
+                    pending.append(executor.submit(analyze_signal, *self._arguments(item)))
+                    if len(pending) >= in_flight:
+                        yield self._collect(pending.popleft().result())
+                while pending:
+                    yield self._collect(pending.popleft().result())
+            finally:
+                # a caller that stops early (e.g. a cancelled GUI run) does not wait for queued signals
+                for future in pending:
+                    future.cancel()
+
+    def run(self, items):
+        """
+        Analyzes the signals.
+
+        Parameters
+        ----------
+        items : iterable
+            (file name, column name, raw signal) tuples.
+
+        Returns
+        -------
+        list of dict: See analyze_signal, in input order.
+        """
+        return list(self.imap(items))
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*
+"""
+Native beat detectors working on whole arrays instead of sample-by-sample loops.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ABP._signal_preprocessing import FilterBank
+from ABP.backends import lazy_import
+
+ndimage = lazy_import("scipy.ndimage")
+ss = lazy_import("scipy.signal")
+
+ABP_BAND = [1, 8]
+SSF_WINDOW = 0.25
+ONSET_SEARCH = 0.3
+ONSET_OFFSET = 0.1
+REFRACTORY = 0.3
+THRESHOLD_FRACTION = 0.5
+THRESHOLD_QUANTILE = 0.8
+THRESHOLD_BEATS = 9
+
+ECG_BAND = [5, 15]
+INTEGRATION_WINDOW = 0.15
+QRS_REFRACTORY = 0.2
+QRS_SEARCH = 0.075
+QRS_THRESHOLD = 0.25
+SEARCH_BACK_INTERVAL = 1.66
+LEVEL_SECONDS = 9
+NOISE_CLIP = 0.3
+
+
+def _moving_sum(values, size):
+    """
+    Calculates a centred moving sum with prefix sums, mirroring the edges.
+
+    Parameters
+    ----------
+    values : array
+        The input values.
+    size : int
+        The window length [samples].
+
+    Returns
+    -------
+    array: The moving sums, the same length as values.
+    """
+    size = max(int(size), 1)
+    head, tail = size // 2, size - size // 2 - 1
+    padded = np.concatenate((values[head:0:-1], values, values[-2:-tail - 2:-1]))[:len(values) + size - 1]
+    cumulative = np.concatenate(([0.0], np.cumsum(padded)))
+    return cumulative[size:] - cumulative[:-size]
+
+
+def _rolling_quantile(values, quantile, beats=THRESHOLD_BEATS):
+    """
+    Calculates a quantile of every value's neighbourhood of beats values.
+
+    Parameters
+    ----------
+    values : array
+        The values, in time order.
+    quantile : float
+        The quantile.
+    beats : int
+        The size of the neighbourhood (odd).
+
+    Returns
+    -------
+    array: The quantile around every value.
+    """
+    if len(values) == 0:
+        return values
+    half = beats // 2
+    padded = np.pad(values, half, mode='reflect' if len(values) > half else 'edge')
+    return np.quantile(sliding_window_view(padded, beats), quantile, axis=1)
+
+
+def _adaptive_threshold(heights, fraction=THRESHOLD_FRACTION, quantile=THRESHOLD_QUANTILE, beats=THRESHOLD_BEATS):
+    """
+    Calculates a threshold per candidate from an upper quantile of its neighbours.
+
+    An upper quantile instead of the median keeps the threshold at the
+    systolic upstrokes when every other candidate is a dicrotic wave.
+
+    Parameters
+    ----------
+    heights : array
+        The heights of the candidate peaks, in time order.
+    fraction : float
+        The fraction of the local quantile a candidate has to reach.
+    quantile : float
+        The quantile of the neighbouring heights.
+    beats : int
+        The number of neighbouring candidates in the quantile (odd).
+
+    Returns
+    -------
+    array: The threshold of every candidate.
+    """
+    return fraction * _rolling_quantile(heights, quantile, beats)
+
+
+def slope_sum(signal, sampling_rate, window=SSF_WINDOW):
+    """
+    Calculates the slope sum function (SSF) of an ABP signal.
+
+    Parameters
+    ----------
+    signal : array
+        The band-passed ABP signal.
+    sampling_rate : float
+        The sampling frequency of the signal [Hz].
+    window : float
+        The length of the summing window [s].
+
+    Returns
+    -------
+    array: The SSF, one sample shorter than the signal.
+    """
+    upslope = np.diff(signal)
+    np.maximum(upslope, 0, out=upslope)
+    return _moving_sum(upslope, window * sampling_rate)
+
+
+def abp_onsets(signal, sampling_rate):
+    """
+    Finds the onsets of ABP pulses with the slope sum function and an adaptive threshold.
+
+    The signal is band-passed to 1-8 Hz and its SSF is computed with prefix
+    sums. Every SSF peak at least REFRACTORY seconds from a higher one is a
+    candidate and is kept if it reaches THRESHOLD_FRACTION of an upper
+    quantile of its THRESHOLD_BEATS neighbours, which follows slow amplitude
+    changes. The onset of a kept pulse is the steepest rise of the SSF
+    before the peak, shifted by ONSET_OFFSET, the reference point of
+    biosppy's Zong et al. detector.
+
+    On the synthetic traces of benchmarks/bench_beats.py at least 99.4% of
+    the biosppy onsets at a true beat are matched within 3 samples, but both
+    detectors report extra beats in long, noisy diastoles. At a 1.5 s beat
+    interval only 94.7% (1 mmHg noise) and 74.0% (4 mmHg noise) of all
+    biosppy onsets are matched. With 4 mmHg noise the native detector
+    reports a third more beats than there are at 1.5 s intervals, an eighth
+    more at 1.2 s and none extra at 0.8 s, and at 0.4 s intervals it misses
+    about 1% of the beats. RR based metrics of slow, noisy recordings should
+    therefore be checked against the plotted beats.
+
+    Parameters
+    ----------
+    signal : array
+        The ABP signal.
+    sampling_rate : float
+        The sampling frequency of the signal [Hz].
+
+    Returns
+    -------
+    array: Indices of the onsets.
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    search = int(ONSET_SEARCH * sampling_rate)
+    if len(signal) <= search + 1:
+        return np.empty(0, dtype=int)
+
+    filtered = FilterBank.filter(signal, 'butter', 'bandpass', 4, ABP_BAND, sampling_rate)
+    ssf = slope_sum(filtered, sampling_rate)
+
+    candidates, properties = ss.find_peaks(ssf, height=0, distance=max(int(REFRACTORY * sampling_rate), 1))
+    pulses = candidates[properties['peak_heights'] >= _adaptive_threshold(properties['peak_heights'])]
+    pulses = pulses[pulses >= search]
+
+    # steepest rise of the SSF in the search window before every pulse, all pulses at once
+    rise = np.diff(ssf)
+    windows = pulses[:, np.newaxis] + np.arange(-search, 0)
+    onsets = windows[np.arange(len(pulses)), np.argmax(rise[windows], axis=1)]
+    onsets += int(ONSET_OFFSET * sampling_rate)
+    return onsets[onsets < len(signal)]
+
+
+def ecg_r_peaks(signal, sampling_rate):
+    """
+    Finds the R-peaks of an ECG with a Pan-Tompkins detector.
+
+    The signal is band-passed to 5-15 Hz, differentiated, squared and
+    integrated over INTEGRATION_WINDOW seconds. Peaks of the integrated
+    signal at least QRS_REFRACTORY seconds apart are candidates. As in
+    Pan-Tompkins, a candidate is a QRS complex if it exceeds the noise level
+    by QRS_THRESHOLD of the distance between the signal and noise levels.
+    Instead of running averages updated beat by beat, the signal level is
+    the median over LEVEL_SECONDS of the per-second maxima and the noise
+    level a rolling median of the candidates clipped at NOISE_CLIP of the
+    signal level, so all candidates are classified at once. Gaps longer
+    than SEARCH_BACK_INTERVAL times the local RR interval are searched again
+    with half the threshold. Every detection is moved to the largest
+    deflection of the signal within QRS_SEARCH seconds.
+
+    Parameters
+    ----------
+    signal : array
+        The ECG signal.
+    sampling_rate : float
+        The sampling frequency of the signal [Hz].
+
+    Returns
+    -------
+    array: Indices of the R-peaks.
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    search = max(int(QRS_SEARCH * sampling_rate), 1)
+    if len(signal) <= 2 * search + 5:
+        return np.empty(0, dtype=int)
+
+    filtered = FilterBank.filter(signal, 'butter', 'bandpass', 2, ECG_BAND, sampling_rate)
+    derivative = np.gradient(filtered)
+    integrated = _moving_sum(derivative * derivative, INTEGRATION_WINDOW * sampling_rate)
+
+    # signal level: the highest integrated value within a second, median filtered over LEVEL_SECONDS
+    second = max(int(sampling_rate), 1)
+    envelope = ndimage.maximum_filter1d(integrated, 2 * second + 1)[::second]
+    envelope = _rolling_quantile(envelope, 0.5, LEVEL_SECONDS)
+    candidates = ss.find_peaks(integrated, distance=max(int(QRS_REFRACTORY * sampling_rate), 1))[0]
+    heights = integrated[candidates]
+    signal_level = np.interp(candidates, np.arange(len(envelope)) * second, envelope)
+    # noise level: the typical candidate, QRS complexes clipped so they do not raise it
+    noise_level = _rolling_quantile(np.minimum(heights, NOISE_CLIP * signal_level), 0.5)
+    threshold = noise_level + QRS_THRESHOLD * (signal_level - noise_level)
+    accepted = heights >= threshold
+
+    # search back: the highest rejected candidate above half the threshold in every long gap
+    peaks = candidates[accepted]
+    if len(peaks) > 2:
+        intervals = np.diff(peaks)
+        local = _rolling_quantile(intervals, 0.5)
+        gap = np.searchsorted(peaks, candidates) - 1
+        inside = (gap >= 0) & (gap < len(intervals))
+        missed = np.flatnonzero(~accepted & inside & (heights >= threshold / 2))
+        missed = missed[intervals[gap[missed]] > SEARCH_BACK_INTERVAL * local[gap[missed]]]
+        order = np.lexsort((-heights[missed], gap[missed]))
+        _, first = np.unique(gap[missed][order], return_index=True)
+        accepted[missed[order][first]] = True
+        peaks = candidates[accepted]
+
+    # R-peak at the largest deflection around every detection, with the dominant polarity of the lead
+    peaks = peaks[(peaks >= search) & (peaks < len(signal) - search)]
+    windows = peaks[:, np.newaxis] + np.arange(-search, search + 1)
+    segments = signal[windows] - np.median(signal[windows], axis=1, keepdims=True)
+    polarity = 1 if np.sum(segments.max(axis=1)) >= -np.sum(segments.min(axis=1)) else -1
+    return np.unique(windows[np.arange(len(peaks)), np.argmax(polarity * segments, axis=1)])
@@ -1,14 +1,14 @@
 # -*- coding: utf-8 -*
 from typing import Any
-import biosppy
+from functools import cached_property
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy import signal
-import pyhrv
-from sympy.physics.quantum.identitysearch import scipy
-import ABP._signal_preprocessing as SP
+from ABP.analysis_context import AnalysisContext, select_metrics
+from ABP.backends import lazy_import
+from ABP.spectral import ar_band_powers, lomb_band_powers, tachogram, welch_band_powers
 import json
 
+pyhrv = lazy_import("pyhrv")
+
 
 
 class FrequencyDomain:
@@ -25,13 +25,21 @@ class FrequencyDomain:
     Attributes
     ----------
     signal : array
-        The signal (filtered).
+        The signal (filtered), computed on first use.
     sampling_frequency : int
         The sampling frequency of the signal.
     window_size : int
         The size of the window.
     overlap : int
         The overlap of the window.
+    method : str
+        The PSD backend, "pyhrv", the built-in "welch", "lomb" or "ar".
+    metric_names : tuple
+        The selected parameters.
+    metrics : dict
+        The selected parameters, computed once on first use.
+    band_powers : list
+        The absolute VLF, LF and HF powers [ms^2], the PSD is computed on first use.
         
     Methods
     -------
@@ -59,49 +67,121 @@ class FrequencyDomain:
         Calculates normalized power of the High Frequency (HF) band.
     """
 
-    def __init__(self, signal, sampling_frequency, window_size, overlap):
+    METRICS = ("VLF", "LF", "HF", "LFHF", "pVLF", "pLF", "pHF", "prcVLF", "prcLF", "prcHF", "nLF", "nHF")
+    METHODS = ("pyhrv", "welch", "lomb", "ar")
+    BACKENDS = ("scipy.signal", "scipy.ndimage", "scipy.interpolate", "biosppy")
+    METHOD_BACKENDS = {"pyhrv": ("pyhrv",)}
+
+    def __init__(self, signal, sampling_frequency, window_size, overlap, analysis_rate=None, method="pyhrv",
+                 signal_type="abp", metrics=None):
         """
         Parameters
         ----------
         self : FrequencyDomain
 
-        signal : array
-            The signal (filtered).
+        signal : array or AnalysisContext
+            The raw signal or a context shared with other domains.
         sampling_frequency : int
             The sampling frequency of the signal.
         window_size : int
             The size of the window.
         overlap : int
             The overlap of the window.
+        analysis_rate : int, optional
+            The rate the signal is decimated to before the analysis [Hz].
+        method : str
+            "pyhrv" for pyhrv's Welch PSD, "welch" for the built-in Welch PSD
+            using window_size and overlap [tachogram samples at 4 Hz], "lomb" for
+            the Lomb-Scargle PSD of the unevenly spaced beats, "ar" for the Burg
+            autoregressive PSD, suited to short epochs.
+        signal_type : str
+            "abp" to measure the NN intervals between pulse onsets, "ecg" between R-peaks.
+        metrics : list of str, optional
+            The parameters returned by __str__, all of them if None. The signal
+            is filtered and the PSD computed only when a parameter is requested.
 
         Returns
         -------
         None
+
+        Raises
+        ------
+        ValueError
+            If the signal, the method or a metric is invalid.
         """
-        self.signal = SP.SignalPreprocessing(signal).signal[0]
-        self.r_peaks = biosppy.signals.abp.abp(signal=self.signal, sampling_rate=200)[2]
-        self.sampling_frequency = sampling_frequency
+        self.context = AnalysisContext.from_signal(signal, sampling_frequency, analysis_rate, signal_type)
+        self.sampling_frequency = self.context.analysis_rate
         self.window_size = window_size
         self.overlap = overlap
+        self.method = method
+        self.metric_names = select_metrics(metrics, self.METRICS)
         self._check_signal()
-        self._calculate_power_in_band()
+        if self.method not in self.METHODS:
+            raise ValueError("Invalid method.")
 
     def __str__(self):
-        data = {
-            "VLF": self.VLF,
-            "LF": self.LF,
-            "HF": self.HF,
-            "LFHF": self.LFHF(),
-            "pVLF": self.pVLF(),
-            "pLF": self.pLF(),
-            "pHF": self.pHF(),
-            "prcVLF": self.prcVLF(),
-            "prcLF": self.prcLF(),
-            "prcHF": self.prcHF(),
-            "nLF": self.nLF(),
-            "nHF": self.nHF()
-        }
-        return json.dumps(data)
+        return json.dumps(self.metrics)
+
+    @property
+    def signal(self):
+        """
+        Returns the filtered signal of the context, filtering it on first use.
+        """
+        return self.context.filtered_signal
+
+    @property
+    def r_peaks(self):
+        """
+        Returns the beats of the context, detecting them on first use.
+        """
+        return self.context.beats
+
+    @cached_property
+    def band_powers(self):
+        """
+        Calculates the absolute VLF, LF and HF powers once.
+
+        Returns
+        -------
+        list: The VLF, LF and HF powers [ms^2].
+        """
+        return self._calculate_power_in_band()
+
+    @property
+    def VLF(self):
+        """
+        Returns the absolute power of the Very Low Frequency (VLF) band [ms^2].
+        """
+        return self.band_powers[0]
+
+    @property
+    def LF(self):
+        """
+        Returns the absolute power of the Low Frequency (LF) band [ms^2].
+        """
+        return self.band_powers[1]
+
+    @property
+    def HF(self):
+        """
+        Returns the absolute power of the High Frequency (HF) band [ms^2].
+        """
+        return self.band_powers[2]
+
+    @cached_property
+    def metrics(self):
+        """
+        Calculates the selected frequency domain parameters.
+
+        Returns
+        -------
+        dict: Parameter name -> value.
+        """
+        values = {}
+        for name in self.metric_names:
+            value = getattr(self, name)
+            values[name] = value() if callable(value) else value
+        return values
 
 
     def _check_signal(self):
@@ -122,37 +202,44 @@ class FrequencyDomain:
             If the signal is not correct.
 
         """
-        if self.signal is None:
+        if self.context.raw_signal is None:
             raise ValueError("Invalid signal.")
 
     def _calculate_power_in_band(self):
         """
-        Calculates Absolute power of the specified frequency band.
+        Calculates Absolute power of the frequency bands.
 
         Parameters
         ----------
         self : FrequencyDomain
-        band_index : int
-            Index of the frequency band.
 
         Returns
         -------
-        float
-            The power of the specified frequency band.
+        list
+            The VLF, LF and HF powers [ms^2].
 
         Raises
         ------
         ValueError
-            If the band_index is invalid.
+            If the method is invalid.
         """
-        psd_result = pyhrv.frequency_domain.welch_psd(
-            self.signal,
-            rpeaks=self.r_peaks,
-            show=False,
-            legend=False,
-            show_param=False,
-        )
-        self.VLF, self.LF, self.HF = psd_result["fft_abs"]
+        if self.method == "pyhrv":
+            psd_result = pyhrv.frequency_domain.welch_psd(
+                nni=self.context.nn_intervals,
+                show=False,
+                legend=False,
+                show_param=False,
+            )
+            return list(psd_result["fft_abs"])
+        elif self.method == "welch":
+            powers = welch_band_powers([tachogram(self.context.nn_intervals)], self.window_size, self.overlap)
+            return powers[0].tolist()
+        elif self.method == "lomb":
+            return lomb_band_powers([self.context.nn_intervals])[0].tolist()
+        elif self.method == "ar":
+            return ar_band_powers([tachogram(self.context.nn_intervals)])[0].tolist()
+        else:
+            raise ValueError("Invalid method.")
 
     def LFHF(self):
         """
@@ -373,6 +460,8 @@ class FrequencyDomain:
 
 
 if __name__ == '__main__':
+    import scipy.signal
+
     time = np.arange(0, 10, 0.01)
 
     # Generate a synthetic "heart rate" signal
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# directory -> bytes this process believes the cache holds, shared by the copies
+# of a cache that are pickled to the worker processes with every signal
+_SIZES = {}
+
+
+class IntermediateCache:
+    """
+    This class stores intermediate arrays of the analysis (filtered signals, beats) on disk.
+
+    Entries are content addressed: the key hashes the raw samples, the name of
+    the stage, its parameters and CODE_VERSION, so the same recording copied
+    into several folders is processed once and any change of the inputs, the
+    parameters or the algorithms simply misses the cache. Bump CODE_VERSION
+    whenever the preprocessing or a beat detector changes its output, the
+    ResultStore keys its rows on the same version.
+
+    The directory is kept below max_bytes by removing the least recently used
+    entries; a hit refreshes the modification time of its file. The size of
+    the directory is scanned once per process and then tracked per write, the
+    directory is only scanned again when the tracked size exceeds max_bytes,
+    and eviction then goes down to LOW_WATER of max_bytes. Other processes
+    writing to the same directory are only seen at that scan, so the limit is
+    approximate.
+
+    Attributes
+    ----------
+    directory : str
+        The directory with the cached .npy files.
+    max_bytes : int
+        The size limit of the directory.
+    hits : int
+        The number of lookups answered from the cache.
+    misses : int
+        The number of lookups that had to be computed.
+
+    Methods
+    -------
+    digest(signal)
+        Hashes the raw samples.
+    key(digest, stage, params)
+        Returns the key of a stage of a signal.
+    get(key)
+        Returns the cached array or None.
+    put(key, array)
+        Stores an array and evicts the least recently used entries.
+    get_or_compute(key, compute)
+        Returns the cached array or computes and stores it.
+    stats()
+        Returns the hit/miss counts and the size of the cache.
+    clear()
+        Removes every entry.
+    """
+
+    CODE_VERSION = 2
+    MAX_BYTES = 1 << 30
+    LOW_WATER = 0.9
+    SUFFIX = ".npy"
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        """
+        Parameters
+        ----------
+        directory : str
+            The directory of the cache, created on the first write.
+        max_bytes : int
+            The size limit of the directory [bytes].
+
+        Returns
+        -------
+        None
+        """
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(signal):
+        """
+        Hashes the raw samples.
+
+        Parameters
+        ----------
+        signal : array
+            The raw signal.
+
+        Returns
+        -------
+        str: The hex digest of the samples, their type and shape.
+        """
+        samples = np.ascontiguousarray(signal)
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(f"{samples.dtype.str}{samples.shape}".encode("utf-8"))
+        hasher.update(samples.data)
+        return hasher.hexdigest()
+
+    def key(self, digest, stage, params):
+        """
+        Returns the key of a stage of a signal.
+
+        Parameters
+        ----------
+        digest : str
+            The digest of the raw samples.
+        stage : str
+            The name of the intermediate result.
+        params : dict
+            Every parameter the stage depends on, JSON serializable.
+
+        Returns
+        -------
+        str: The hex key.
+        """
+        description = json.dumps([digest, stage, params, self.CODE_VERSION], sort_keys=True)
+        return hashlib.blake2b(description.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key):
+        """
+        Returns the cached array and marks it as recently used.
+
+        Parameters
+        ----------
+        key : str
+            The key, see key().
+
+        Returns
+        -------
+        array: The cached array or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            array = np.load(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return array
+
+    def put(self, key, array):
+        """
+        Stores an array and evicts the least recently used entries above max_bytes.
+
+        Parameters
+        ----------
+        key : str
+            The key, see key().
+        array : array
+            The array to store.
+
+        Returns
+        -------
+        None
+        """
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+                size = f.tell()
+            # sized before the replace, so neither the new file nor an overwritten one is counted twice
+            total = self._size()
+            try:
+                total -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(temporary, path)
+            _SIZES[self.directory] = total + size
+            if _SIZES[self.directory] > self.max_bytes:
+                self._evict()
+        except OSError:
+            # caching is best effort, a read-only directory just never hits
+            pass
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached array or computes and stores it.
+
+        Parameters
+        ----------
+        key : str
+            The key, see key().
+        compute : callable
+            Returns the array on a miss.
+
+        Returns
+        -------
+        array: The cached or computed array.
+        """
+        array = self.get(key)
+        if array is None:
+            array = compute()
+            self.put(key, array)
+        return array
+
+    def _entries(self):
+        """
+        Lists the cached files.
+
+        Returns
+        -------
+        list of tuple: (modification time, size, path), least recently used first.
+        """
+        entries = []
+        try:
+            with os.scandir(self.directory) as iterator:
+                for entry in iterator:
+                    if entry.name.endswith(self.SUFFIX):
+                        try:
+                            status = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((status.st_mtime, status.st_size, entry.path))
+        except OSError:
+            return []
+        return sorted(entries)
+
+    def _size(self):
+        """
+        Returns the tracked size of the directory, scanned on the first call in a process.
+
+        Returns
+        -------
+        int: The size [bytes].
+        """
+        if self.directory not in _SIZES:
+            _SIZES[self.directory] = sum(size for _, size, _ in self._entries())
+        return _SIZES[self.directory]
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the directory is below LOW_WATER of max_bytes.
+
+        Returns
+        -------
+        None
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        target = self.LOW_WATER * self.max_bytes if total > self.max_bytes else self.max_bytes
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        _SIZES[self.directory] = total
+
+    def stats(self):
+        """
+        Returns the hit/miss counts of this instance and the size of the cache.
+
+        Returns
+        -------
+        dict: hits, misses, hit_rate, entries and bytes.
+        """
+        entries = self._entries()
+        _SIZES[self.directory] = sum(size for _, size, _ in entries)
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+    def clear(self):
+        """
+        Removes every entry.
+
+        Returns
+        -------
+        None
+        """
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        _SIZES.pop(self.directory, None)
@@ -1,19 +1,294 @@
 # -*- coding: utf-8 -*
 
-from frequency_domain import FrequencyDomain as FD
-from _signal_preprocessing import SignalPreprocessing as SP
-from time_domain import TimeDomain as TD
-import matplotlib.pyplot as plt
+import numpy as np
+
+from ABP.analysis_context import AnalysisContext
+from ABP.backends import lazy_import
+
+plt = lazy_import("matplotlib.pyplot")
+
+
+class SignalPyramid:
+    """
+    This class keeps min/max decimations of a signal so any range can be drawn
+    with about one point pair per pixel.
+
+    Level k stores the minimum and maximum of blocks of FACTOR ** k samples,
+    so the levels add up to about 2 / (FACTOR - 1) of the signal. view()
+    takes the finest level with at least one block per pixel and folds it
+    into exactly one (min, max) pair per pixel, which keeps every peak of the
+    signal visible at any zoom while the cost only depends on the width.
+
+    Attributes
+    ----------
+    signal : array
+        The raw signal.
+    levels : list of tuple
+        (block size, minimums, maximums) from the finest to the coarsest level.
+
+    Methods
+    -------
+    view(start, stop, pixels)
+        Returns the points to draw for a range of samples.
+    """
+
+    FACTOR = 4
+    MIN_BLOCKS = 1024
+
+    def __init__(self, signal):
+        """
+        Parameters
+        ----------
+        signal : array
+            The raw signal.
+
+        Returns
+        -------
+        None
+        """
+        self.signal = np.asarray(signal)
+        self.levels = []
+        minimums = maximums = self.signal
+        block = 1
+        while len(minimums) > self.MIN_BLOCKS:
+            minimums = self._reduce(minimums, np.minimum)
+            maximums = self._reduce(maximums, np.maximum)
+            block *= self.FACTOR
+            self.levels.append((block, minimums, maximums))
+
+    def __len__(self):
+        return len(self.signal)
+
+    @classmethod
+    def _reduce(cls, values, function):
+        """reduce blocks of FACTOR values, the last block may be shorter."""
+        return function.reduceat(values, np.arange(0, len(values), cls.FACTOR))
+
+    def view(self, start, stop, pixels):
+        """
+        Returns the points to draw for a range of samples.
+
+        Parameters
+        ----------
+        start : int
+            The first sample of the range.
+        stop : int
+            The sample after the range.
+        pixels : int
+            The width of the plot [pixels].
+
+        Returns
+        -------
+        tuple: The sample positions and the values, a (min, max) pair per pixel
+        once the range is longer than the width, the raw samples otherwise.
+        """
+        start = min(max(int(start), 0), len(self.signal))
+        stop = min(max(int(stop), start), len(self.signal))
+        pixels = max(int(pixels), 1)
+        if stop - start <= 2 * pixels:
+            positions = np.arange(start, stop)
+            return positions, self.signal[start:stop]
+
+        block, minimums, maximums = 1, self.signal, self.signal
+        for level in self.levels:
+            if (stop - start) // level[0] < pixels:
+                break
+            block, minimums, maximums = level
+        first, last = start // block, -(-stop // block)
+        minimums, maximums = minimums[first:last], maximums[first:last]
+        edges = np.linspace(0, len(minimums), pixels + 1).astype(np.intp)[:-1]
+        edges = np.unique(edges)
+        positions = (first + edges) * block
+        positions = np.repeat(np.maximum(positions, start), 2)
+        values = np.empty(len(positions), dtype=minimums.dtype)
+        values[0::2] = np.minimum.reduceat(minimums, edges)
+        values[1::2] = np.maximum.reduceat(maximums, edges)
+        return positions, values
+
+
+class SignalViewer:
+    """
+    This class draws a signal with matplotlib and redraws it from a SignalPyramid
+    whenever the visible range changes.
+
+    Beats are given as sorted sample positions, so the beats of the visible
+    range are found with a binary search; they are hidden while there are more
+    of them than pixels.
+
+    Attributes
+    ----------
+    pyramid : SignalPyramid
+        The decimations of the signal.
+    sampling_frequency : int
+        The sampling frequency of the signal [Hz].
+    start_time : float
+        The time of the first sample [s].
+    beats : array
+        Sorted sample positions of the beats.
+    axes : Axes
+        The axes the signal is drawn on.
+
+    Methods
+    -------
+    visible_beats(start, stop)
+        Returns the beats within a range of samples.
+    update()
+        Redraws the visible range.
+    """
+
+    def __init__(self, signal, sampling_frequency=200, beats=None, start_time=0.0, axes=None):
+        """
+        Parameters
+        ----------
+        signal : array or SignalPyramid
+            The raw signal or its pyramid.
+        sampling_frequency : int
+            The sampling frequency of the signal [Hz].
+        beats : array, optional
+            Sorted sample positions of the beats.
+        start_time : float
+            The time of the first sample [s].
+        axes : Axes, optional
+            The axes to draw on, None creates a new figure.
+
+        Returns
+        -------
+        None
+        """
+        self.pyramid = signal if isinstance(signal, SignalPyramid) else SignalPyramid(signal)
+        self.sampling_frequency = int(sampling_frequency)
+        self.start_time = float(start_time)
+        self.beats = np.empty(0, dtype=np.intp) if beats is None else np.asarray(beats)
+        self.axes = plt.subplots()[1] if axes is None else axes
+
+        self.line, = self.axes.plot([], [], linewidth=0.8)
+        self.markers, = self.axes.plot([], [], "o", markersize=3, color="tab:red")
+        signal = self.pyramid.signal
+        coarsest = self.pyramid.levels[-1][1:] if self.pyramid.levels else (signal, signal)
+        low, high = float(np.min(coarsest[0])), float(np.max(coarsest[1]))
+        margin = 0.05 * (high - low) or 1.0
+        self.axes.set_ylim(low - margin, high + margin)
+        self.axes.set_xlim(self._time(0), self._time(len(self.pyramid)))
+        self.axes.set_xlabel("time [s]")
+
+        self.axes.callbacks.connect("xlim_changed", lambda _: self.update())
+        self.axes.figure.canvas.mpl_connect("resize_event", lambda _: self.update())
+        self.update()
+
+    def _time(self, samples):
+        return self.start_time + np.asarray(samples) / self.sampling_frequency
+
+    def visible_beats(self, start, stop):
+        """
+        Returns the beats within a range of samples.
+
+        Parameters
+        ----------
+        start : int
+            The first sample of the range.
+        stop : int
+            The sample after the range.
+
+        Returns
+        -------
+        array: Sample positions of the beats.
+        """
+        first, last = np.searchsorted(self.beats, (start, stop))
+        return self.beats[first:last]
+
+    def update(self):
+        """
+        Redraws the visible range with one point pair per pixel.
+
+        Returns
+        -------
+        None
+        """
+        left, right = self.axes.get_xlim()
+        start = int(np.floor((left - self.start_time) * self.sampling_frequency))
+        stop = int(np.ceil((right - self.start_time) * self.sampling_frequency)) + 1
+        pixels = self.axes.get_window_extent().width
+
+        positions, values = self.pyramid.view(start, stop, pixels)
+        self.line.set_data(self._time(positions), values)
+
+        beats = self.visible_beats(max(start, 0), stop)
+        if len(beats) > pixels:
+            beats = beats[:0]
+        self.markers.set_data(self._time(beats), self.pyramid.signal[beats])
+        self.axes.figure.canvas.draw_idle()
+
+
 class Plotting:
+    """
+    This class plots a signal with its detected beats.
+
+    Attributes
+    ----------
+    signal : array
+        The raw signal.
+    time : array or None
+        The time of every sample [s], only its first value is used.
+    context : AnalysisContext
+        The intermediate results of the signal, the beats come from here.
 
-    def __init__(self, signal, time):
-        self.signal = signal
+    Methods
+    -------
+    plot_signal()
+        Shows the signal in a SignalViewer.
+    """
+
+    def __init__(self, signal, time=None, sampling_frequency=200, analysis_rate=None, signal_type="abp"):
+        """
+        Parameters
+        ----------
+        signal : array or AnalysisContext
+            The raw signal or an existing context.
+        time : array, optional
+            The time of every sample [s].
+        sampling_frequency : int
+            The sampling frequency of the signal [Hz].
+        analysis_rate : int, optional
+            The analysis rate of the beat detection [Hz].
+        signal_type : str
+            "abp" or "ecg".
+
+        Returns
+        -------
+        None
+        """
+        self.context = AnalysisContext.from_signal(signal, sampling_frequency, analysis_rate, signal_type)
+        self.signal = np.asarray(self.context.raw_signal)
         self.time = time
-        self.Sp = SP(self.signal)
-        self.Td = TD(self.time, self.Sp)
-        self.Fd = FD(self.Sp, 200, 256, 128)
 
+    @property
+    def beats(self):
+        """
+        Returns the beats as positions in the raw signal.
+
+        Returns
+        -------
+        array: Sorted sample positions.
+        """
+        scale = self.context.sampling_frequency / self.context.analysis_rate
+        beats = np.round(np.asarray(self.context.beats) * scale).astype(np.intp)
+        return beats[beats < len(self.signal)]
+
+    def plot_signal(self, beats=True):
+        """
+        Shows the signal with one point pair per pixel at any zoom.
+
+        Parameters
+        ----------
+        beats : bool
+            Whether the detected beats are overlaid.
 
-    def plot_signal(self):
-        plt.plot(self.time, self.signal)
+        Returns
+        -------
+        SignalViewer
+        """
+        start_time = 0.0 if self.time is None or len(self.time) == 0 else float(self.time[0])
+        viewer = SignalViewer(self.signal, self.context.sampling_frequency,
+                              self.beats if beats else None, start_time)
         plt.show()
+        return viewer
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*
+
+from functools import lru_cache
+import numpy as np
+from ABP.backends import lazy_import
+
+interpolate = lazy_import("scipy.interpolate")
+ss = lazy_import("scipy.signal")
+
+
+FREQUENCY_BANDS = {"VLF": (0.0, 0.04), "LF": (0.04, 0.15), "HF": (0.15, 0.4)}
+INTERPOLATION_RATE = 4
+
+
+def tachogram(nn_intervals, rate=INTERPOLATION_RATE):
+    """
+    Builds the evenly sampled RR tachogram the same way pyhrv does.
+
+    Parameters
+    ----------
+    nn_intervals : array
+        Intervals between consecutive beats [ms].
+    rate : float
+        The interpolation rate [Hz].
+
+    Returns
+    -------
+    array: The cubic interpolated intervals without their mean [ms].
+
+    Raises
+    ------
+    ValueError
+        If there are less than four intervals.
+    """
+    nn_intervals = np.asarray(nn_intervals, dtype=np.float64)
+    if len(nn_intervals) < 4:
+        raise ValueError("At least four beat intervals are needed.")
+    t = np.cumsum(nn_intervals)
+    t -= t[0]
+    interpolated = interpolate.interp1d(t, nn_intervals, 'cubic')(np.arange(0, t[-1], 1000. / rate))
+    return interpolated - interpolated.mean()
+
+
+@lru_cache(maxsize=None)
+def band_masks(nfft, rate=INTERPOLATION_RATE):
+    """
+    Returns the frequency grid of a one-sided spectrum and the masks of the bands.
+
+    Parameters
+    ----------
+    nfft : int
+        The FFT length.
+    rate : float
+        The sampling rate of the tachogram [Hz].
+
+    Returns
+    -------
+    tuple[array, array]: The frequencies and a (bands, frequencies) boolean mask,
+    every frequency is in at most one band.
+    """
+    frequencies = np.fft.rfftfreq(nfft, 1 / rate)
+    # half-open bands as in pyhrv, a bin on a band edge belongs to the upper band only
+    masks = np.array([(low <= frequencies) & (frequencies < high) for low, high in FREQUENCY_BANDS.values()])
+    frequencies.flags.writeable = False
+    masks.flags.writeable = False
+    return frequencies, masks
+
+
+def welch_band_powers(tachograms, window_size, overlap, rate=INTERPOLATION_RATE):
+    """
+    Calculates the Welch PSD of many tachograms in one FFT call and integrates the bands.
+
+    Every tachogram is cut into Hamming windowed segments of window_size samples
+    overlapping by overlap samples (shorter tachograms use a single segment),
+    all segments go through one batched real FFT and the periodograms are
+    averaged per tachogram, like scipy.signal.welch with scaling='density'.
+
+    Parameters
+    ----------
+    tachograms : list of arrays
+        Evenly sampled tachograms, see tachogram().
+    window_size : int
+        The length of a segment [samples].
+    overlap : int
+        The overlap of consecutive segments [samples].
+    rate : float
+        The sampling rate of the tachograms [Hz].
+
+    Returns
+    -------
+    array: (tachograms, 3) absolute VLF, LF and HF powers [ms^2].
+
+    Raises
+    ------
+    ValueError
+        If the overlap is not smaller than the window size.
+    """
+    window_size, overlap = int(window_size), int(overlap)
+    if not 0 <= overlap < window_size:
+        raise ValueError("Invalid window size or overlap.")
+
+    # group the segments by length, usually a single group
+    groups = {}
+    owners = {}
+    for index, series in enumerate(tachograms):
+        series = np.asarray(series, dtype=np.float64)
+        length = min(window_size, len(series))
+        segments = np.lib.stride_tricks.sliding_window_view(series, length)[::window_size - overlap]
+        groups.setdefault(length, []).append(segments)
+        owners.setdefault(length, []).append(np.full(len(segments), index))
+
+    frequencies, masks = band_masks(window_size, rate)
+    spectra = np.zeros((len(tachograms), len(frequencies)))
+    counts = np.zeros(len(tachograms))
+    for length, segments in groups.items():
+        segments = np.concatenate(segments)
+        owner = np.concatenate(owners[length])
+        window = ss.windows.hamming(length, sym=False)
+        segments = (segments - segments.mean(axis=1, keepdims=True)) * window
+        periodograms = np.abs(np.fft.rfft(segments, n=window_size, axis=1)) ** 2 / (rate * (window * window).sum())
+        np.add.at(spectra, owner, periodograms)
+        counts += np.bincount(owner, minlength=len(tachograms))
+
+    spectra /= counts[:, np.newaxis]
+    # one-sided density: double everything except DC and an even Nyquist bin
+    spectra[:, 1:window_size // 2 + (window_size % 2)] *= 2
+    return spectra @ masks.T * (frequencies[1] - frequencies[0])
+
+
+LOMB_RESOLUTION = 0.001
+LOMB_CHUNK = 1 << 22
+LOMB_SEGMENT = 300
+
+
+@lru_cache(maxsize=None)
+def lomb_grid(resolution=LOMB_RESOLUTION):
+    """
+    Returns the frequency grid shared by every Lomb-Scargle spectrum and the masks of the bands.
+
+    Parameters
+    ----------
+    resolution : float
+        The spacing of the grid [Hz], the grid ends at the top of the HF band.
+
+    Returns
+    -------
+    tuple[array, array]: The frequencies and a (bands, frequencies) boolean mask,
+    every frequency is in at most one band.
+    """
+    top = max(high for _, high in FREQUENCY_BANDS.values())
+    frequencies = np.arange(1, int(round(top / resolution)) + 1) * resolution
+    masks = np.array([(low <= frequencies) & (frequencies < high) for low, high in FREQUENCY_BANDS.values()])
+    frequencies.flags.writeable = False
+    masks.flags.writeable = False
+    return frequencies, masks
+
+
+def lomb_psd(nn_intervals, resolution=LOMB_RESOLUTION, segment_duration=LOMB_SEGMENT):
+    """
+    Calculates the Lomb-Scargle PSD directly on the unevenly spaced beats.
+
+    Long series are cut into segments of segment_duration seconds and their
+    periodograms averaged, so the shared grid stays fine enough for the width
+    of the spectral peaks. The grid holds multiples of its resolution, so
+    exp(i*w*t) of every grid frequency is a running product of the lowest one;
+    the trigonometric sums of all segments are accumulated for all frequencies
+    at once over chunks of beats, with no sin/cos per frequency.
+
+    Parameters
+    ----------
+    nn_intervals : array
+        Intervals between consecutive beats [ms].
+    resolution : float
+        The spacing of the frequency grid [Hz].
+    segment_duration : float
+        The length of the averaged segments [s].
+
+    Returns
+    -------
+    tuple[array, array]: The frequencies [Hz] and the one-sided density [ms^2/Hz].
+
+    Raises
+    ------
+    ValueError
+        If there are less than four intervals.
+    """
+    nn_intervals = np.asarray(nn_intervals, dtype=np.float64)
+    if len(nn_intervals) < 4:
+        raise ValueError("At least four beat intervals are needed.")
+    times = np.cumsum(nn_intervals) / 1000
+    times -= times[0]
+
+    # the remainder joins the last segment, a series shorter than one segment is a single segment
+    segment = np.minimum((times // segment_duration).astype(np.int64), max(int(times[-1] // segment_duration), 1) - 1)
+    segments = segment[-1] + 1
+    counts = np.bincount(segment, minlength=segments)
+    values = nn_intervals - (np.bincount(segment, nn_intervals, minlength=segments) / counts)[segment]
+
+    frequencies, _ = lomb_grid(resolution)
+    # per segment sum of y * exp(i w t) and sum of exp(2 i w t) for every frequency
+    weighted = np.zeros((len(frequencies), segments), dtype=np.complex128)
+    doubled = np.zeros((len(frequencies), segments), dtype=np.complex128)
+    step = max(LOMB_CHUNK // len(frequencies), 1)
+    for start in range(0, len(times), step):
+        chunk = slice(start, start + step)
+        rotation = np.exp(2j * np.pi * frequencies[0] * times[chunk])
+        harmonics = np.cumprod(np.broadcast_to(rotation, (len(frequencies), len(rotation))), axis=0)
+        first, last = segment[chunk][0], segment[chunk][-1] + 1
+        membership = segment[chunk, np.newaxis] == np.arange(first, last)
+        weighted[:, first:last] += harmonics @ (membership * values[chunk, np.newaxis])
+        doubled[:, first:last] += (harmonics * harmonics) @ membership
+    yc, ys = weighted.real, weighted.imag
+    c2, s2 = doubled.real, doubled.imag
+
+    # time shift tau makes the periodogram invariant to the time origin
+    two_tau = np.arctan2(s2, c2)
+    cos_tau, sin_tau = np.cos(two_tau / 2), np.sin(two_tau / 2)
+    shifted = c2 * np.cos(two_tau) + s2 * np.sin(two_tau)
+    power = 0.5 * ((yc * cos_tau + ys * sin_tau) ** 2 / (counts / 2 + shifted / 2)
+                   + (ys * cos_tau - yc * sin_tau) ** 2 / (counts / 2 - shifted / 2))
+
+    # scale so that the band integrals approximate the variance [ms^2]
+    first_time = times[np.searchsorted(segment, np.arange(segments))]
+    last_time = times[np.searchsorted(segment, np.arange(segments), side="right") - 1]
+    duration = last_time - first_time
+    return frequencies, np.mean(2 * power * duration / counts, axis=1)
+
+
+def lomb_band_powers(nn_interval_series, resolution=LOMB_RESOLUTION):
+    """
+    Calculates the VLF, LF and HF powers of many beat series on the shared Lomb-Scargle grid.
+
+    Parameters
+    ----------
+    nn_interval_series : list of arrays
+        Intervals between consecutive beats of every series [ms].
+    resolution : float
+        The spacing of the frequency grid [Hz].
+
+    Returns
+    -------
+    array: (series, 3) absolute VLF, LF and HF powers [ms^2].
+    """
+    _, masks = lomb_grid(resolution)
+    spectra = np.array([lomb_psd(nn_intervals, resolution)[1] for nn_intervals in nn_interval_series])
+    return spectra.reshape(-1, masks.shape[1]) @ masks.T * resolution
+
+
+AR_MAX_ORDER = 16
+AR_NFFT = 4096
+
+
+def burg(segments, max_order=AR_MAX_ORDER):
+    """
+    Fits autoregressive models with Burg's method to many equal-length segments at once.
+
+    The reflection coefficients are estimated for all segments in one array
+    operation per order and the AR polynomial is updated with the
+    Levinson-Durbin recursion. For every segment the order with the lowest
+    Akaike information criterion is kept.
+
+    Parameters
+    ----------
+    segments : array
+        2-D array, one zero-mean segment per row.
+    max_order : int
+        The highest model order tried.
+
+    Returns
+    -------
+    tuple[array, array, array]: (segments, max_order + 1) polynomials [1, a1, ..., ap, 0, ...],
+    the prediction error powers and the selected orders.
+
+    Raises
+    ------
+    ValueError
+        If the segments are not longer than max_order.
+    """
+    segments = np.atleast_2d(np.asarray(segments, dtype=np.float64))
+    rows, length = segments.shape
+    if length <= max_order:
+        raise ValueError("The segments must be longer than the model order.")
+
+    forward, backward = segments.copy(), segments.copy()
+    polynomials = np.zeros((max_order + 1, rows, max_order + 1))
+    polynomials[:, :, 0] = 1
+    errors = np.empty((max_order + 1, rows))
+    errors[0] = np.mean(segments * segments, axis=1)
+
+    for order in range(1, max_order + 1):
+        forward, backward = forward[:, 1:], backward[:, :-1]
+        denominator = np.sum(forward * forward, axis=1) + np.sum(backward * backward, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            reflection = np.nan_to_num(-2 * np.sum(forward * backward, axis=1) / denominator)
+        forward, backward = forward + reflection[:, np.newaxis] * backward, backward + reflection[:, np.newaxis] * forward
+
+        previous = polynomials[order - 1]
+        polynomials[order] = previous
+        polynomials[order, :, 1:order + 1] += reflection[:, np.newaxis] * previous[:, order - 1::-1]
+        errors[order] = errors[order - 1] * (1 - reflection * reflection)
+
+    with np.errstate(divide="ignore"):
+        criterion = length * np.log(errors[1:]) + 2 * np.arange(1, max_order + 1)[:, np.newaxis]
+    selected = np.argmin(criterion, axis=0) + 1
+    index = np.arange(rows)
+    return polynomials[selected, index], errors[selected, index], selected
+
+
+def ar_band_powers(tachograms, max_order=AR_MAX_ORDER, nfft=AR_NFFT, rate=INTERPOLATION_RATE):
+    """
+    Calculates the VLF, LF and HF powers of many tachograms from Burg AR spectra.
+
+    Tachograms (or epochs) of equal length are fitted together; each group
+    needs one Burg fit and one batched FFT of the AR polynomials.
+
+    Parameters
+    ----------
+    tachograms : list of arrays or 2-D array
+        Evenly sampled tachograms or epochs, see tachogram().
+    max_order : int
+        The highest model order tried.
+    nfft : int
+        The FFT length of the spectrum.
+    rate : float
+        The sampling rate of the tachograms [Hz].
+
+    Returns
+    -------
+    array: (tachograms, 3) absolute VLF, LF and HF powers [ms^2].
+
+    Raises
+    ------
+    ValueError
+        If a tachogram is not longer than max_order.
+    """
+    frequencies, masks = band_masks(nfft, rate)
+    groups = {}
+    for index, series in enumerate(tachograms):
+        groups.setdefault(len(series), []).append(index)
+
+    powers = np.empty((len(tachograms), len(masks)))
+    for indices in groups.values():
+        segments = np.array([tachograms[i] for i in indices], dtype=np.float64)
+        segments -= segments.mean(axis=1, keepdims=True)
+        polynomials, errors, _ = burg(segments, max_order)
+        response = np.abs(np.fft.rfft(polynomials, n=nfft, axis=1)) ** 2
+        # one-sided density integrating to the variance
+        spectra = 2 * errors[:, np.newaxis] / (rate * response)
+        powers[indices] = spectra @ masks.T * (frequencies[1] - frequencies[0])
+    return powers
@@ -1,13 +1,184 @@
 # -*- coding: utf-8 -*
 
 from typing import Any
-import biosppy.signals.abp
+from functools import cached_property
 import numpy as np
-from matplotlib import pyplot as plt
-from sympy.physics.quantum.identitysearch import scipy
-from ABP._signal_preprocessing import SignalPreprocessing as SP
+from ABP.analysis_context import AnalysisContext, select_metrics
+from ABP.backends import lazy_import
 import json
-import scipy.signal as ss
+
+pd = lazy_import("pandas")
+ss = lazy_import("scipy.signal")
+
+
+TIME_DOMAIN_DTYPE = np.dtype([
+    ("RMSSD", np.float64),
+    ("SDNN", np.float64),
+    ("NN50", np.int64),
+    ("pNN50", np.float64),
+    ("NN20", np.int64),
+    ("pNN20", np.float64),
+    ("SDRR", np.float64),
+    ("mRR", np.float64),
+    ("mHRV", np.float64),
+    ("SDHR", np.float64),
+])
+
+DIFFERENCE_METRICS = frozenset(("RMSSD", "NN50", "pNN50", "NN20", "pNN20"))
+SPREAD_METRICS = frozenset(("SDNN", "SDHR"))
+RR_METRICS = frozenset(("SDRR", "mRR", "mHRV"))
+
+
+def time_domain_batch(segments, rr_intervals=None, sampling_frequency=200, fields=None):
+    """
+    Calculates the time domain parameters of many equal-length segments at once.
+
+    The successive differences and the RR statistics are computed once per call,
+    and only if a selected parameter needs them, and every parameter is derived
+    from them with whole-array operations.
+
+    Parameters
+    ----------
+    segments : array
+        2-D array, one filtered segment per row.
+    rr_intervals : list of arrays, optional
+        RR intervals of every segment [samples]. Detected with find_peaks if None
+        and an RR parameter is selected.
+    sampling_frequency : int
+        The sampling frequency of the segments [Hz], it converts the RR
+        intervals to [ms].
+    fields : list of str, optional
+        The parameters to calculate, all of them if None.
+
+    Returns
+    -------
+    array
+        Structured array with the selected TIME_DOMAIN_DTYPE fields, one row per segment.
+
+    Raises
+    ------
+    ValueError
+        If the number of RR interval arrays does not match the segments or a
+        field is invalid.
+    """
+    fields = select_metrics(fields, TIME_DOMAIN_DTYPE.names)
+    selected = set(fields)
+    segments = np.atleast_2d(np.asarray(segments, dtype=np.float64))
+    rows, length = segments.shape
+    if rr_intervals is None and selected & RR_METRICS:
+        rr_intervals = [np.diff(ss.find_peaks(row, distance=sampling_frequency)[0]) for row in segments]
+    if rr_intervals is not None and len(rr_intervals) != rows:
+        raise ValueError("Invalid number of RR interval arrays.")
+
+    values = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if selected & DIFFERENCE_METRICS:
+            differences = np.diff(segments, axis=1)
+            values["RMSSD"] = np.sqrt(np.mean(differences * differences, axis=1))
+            values["NN50"] = np.count_nonzero(differences > 50, axis=1)
+            values["pNN50"] = values["NN50"] / length
+            values["NN20"] = np.count_nonzero(differences > 20, axis=1)
+            values["pNN20"] = values["NN20"] / length
+
+        if selected & SPREAD_METRICS:
+            values["SDNN"] = np.std(segments, axis=1)
+            values["SDHR"] = 60 / values["SDNN"]
+
+        if selected & RR_METRICS:
+            # RR statistics of all segments from one flat array
+            counts = np.array([len(rr) for rr in rr_intervals])
+            owner = np.repeat(np.arange(rows), counts)
+            flat = np.concatenate([np.asarray(rr, dtype=np.float64) for rr in rr_intervals]) if rows else np.empty(0)
+            flat = flat * 1000 / sampling_frequency
+            mean = np.bincount(owner, flat, minlength=rows) / counts
+            deviation = flat - mean[owner]
+            values["mRR"] = mean
+            values["SDRR"] = np.sqrt(np.bincount(owner, deviation * deviation, minlength=rows) / counts)
+            values["mHRV"] = 60000 / values["mRR"]
+
+    metrics = np.empty(rows, dtype=[(name, TIME_DOMAIN_DTYPE[name]) for name in fields])
+    for name in fields:
+        metrics[name] = values[name]
+    return metrics
+
+
+def time_domain_windows(signal, r_peaks, window_size, step, sampling_frequency=200):
+    """
+    Calculates the time domain parameters over sliding windows in linear time.
+
+    Every parameter is derived from running sums, sums of squares and counts,
+    so each sample and each beat is visited a constant number of times however
+    many windows overlap it. An RR interval belongs to a window when both of
+    its peaks lie inside the window.
+
+    Parameters
+    ----------
+    signal : array
+        The filtered signal.
+    r_peaks : array
+        Sorted indices of the peaks of the whole signal.
+    window_size : int
+        The length of the window [samples].
+    step : int
+        The distance between the starts of consecutive windows [samples].
+    sampling_frequency : int
+        The sampling frequency of the signal [Hz], it converts the RR
+        intervals to [ms] and the window starts to [s].
+
+    Returns
+    -------
+    DataFrame
+        One row per window indexed by the window start [s], one column per parameter.
+
+    Raises
+    ------
+    ValueError
+        If the window or the step is not positive.
+    """
+    if window_size < 2 or step < 1:
+        raise ValueError("Invalid window size or step.")
+
+    signal = np.asarray(signal, dtype=np.float64)
+    starts = np.arange(0, len(signal) - window_size + 1, step)
+    ends = starts + window_size
+
+    def running(values):
+        return np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+
+    def window_sum(prefix, lo, hi):
+        return prefix[hi] - prefix[lo]
+
+    # centring keeps the running sum of squares accurate on long recordings
+    centred = signal - signal.mean() if len(signal) else signal
+    differences = np.diff(signal)
+    sum_x, sum_x2 = running(centred), running(centred * centred)
+    sum_d2 = running(differences * differences)
+    count_50, count_20 = running(differences > 50), running(differences > 20)
+
+    r_peaks = np.asarray(r_peaks)
+    rr = np.diff(r_peaks) * 1000 / sampling_frequency
+    sum_rr, sum_rr2 = running(rr), running(rr * rr)
+    first = np.searchsorted(r_peaks, starts, side="left")
+    last = np.searchsorted(r_peaks, ends, side="left") - 1
+    rr_count = np.maximum(last - first, 0)
+    last = np.maximum(last, first)
+
+    metrics = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = window_sum(sum_x, starts, ends) / window_size
+        metrics["RMSSD"] = np.sqrt(window_sum(sum_d2, starts, ends - 1) / (window_size - 1))
+        metrics["SDNN"] = np.sqrt(np.maximum(window_sum(sum_x2, starts, ends) / window_size - mean * mean, 0))
+        metrics["NN50"] = window_sum(count_50, starts, ends - 1).astype(np.int64)
+        metrics["pNN50"] = metrics["NN50"] / window_size
+        metrics["NN20"] = window_sum(count_20, starts, ends - 1).astype(np.int64)
+        metrics["pNN20"] = metrics["NN20"] / window_size
+        rr_mean = window_sum(sum_rr, first, last) / rr_count
+        metrics["SDRR"] = np.sqrt(np.maximum(window_sum(sum_rr2, first, last) / rr_count - rr_mean * rr_mean, 0))
+        metrics["mRR"] = rr_mean
+        metrics["mHRV"] = 60000 / rr_mean
+        metrics["SDHR"] = 60 / metrics["SDNN"]
+
+    return pd.DataFrame(metrics, index=pd.Index(starts / sampling_frequency, name="time"))
 
 
 class TimeDomain:
@@ -26,7 +197,13 @@ class TimeDomain:
     time : array
         The time vector of the signal.
     signal : array
-        The signal (filtered).
+        The signal (filtered), computed on first use.
+    r_peaks : array
+        The peaks of the signal, computed on first use.
+    metric_names : tuple
+        The selected parameters.
+    metrics : dict
+        The selected parameters, computed once on first use.
     
     Methods
     -------
@@ -50,27 +227,99 @@ class TimeDomain:
         Calculates the mean of HRV (mHRV) of the signal.
     SDHR()
         Calculates the Standard Deviation of HR (SDHR) of the signal.
+    windowed(window_seconds, step_seconds)
+        Calculates all parameters over sliding windows.
     """
 
-    def __init__(self, signal, sampling_frequency=200, time = None):
+    METRICS = TIME_DOMAIN_DTYPE.names
+    BACKENDS = ("scipy.signal", "scipy.ndimage", "biosppy")
+
+    def __init__(self, signal, sampling_frequency=200, time = None, analysis_rate=None, signal_type="abp",
+                 metrics=None):
         """
         Parameters
         ----------
         time : array
             The time vector of the signal [ms].
-        signal : array
-            The signal (filtered).
+        signal : array or AnalysisContext
+            The raw signal or a context shared with other domains.
         sampling_frequency : int
             The sampling frequency of the signal [Hz].
+        analysis_rate : int, optional
+            The rate the signal is decimated to before the analysis [Hz].
+        signal_type : str
+            "abp", or "ecg" to find the R-peaks with the Pan-Tompkins detector.
+        metrics : list of str, optional
+            The parameters returned by __str__, all of them if None. Nothing is
+            filtered or detected until a parameter is requested, and the peaks
+            only if SDRR, mRR or mHRV is.
 
         Returns
         -------
         None
+
+        Raises
+        ------
+        ValueError
+            If a metric is invalid.
         """
         self.time = time
-        self.signal = SP(signal).signal[0]
-        self.sampling_frequency = sampling_frequency
-        self.r_peaks = ss.find_peaks(self.signal, distance=200)[0]
+        self.context = AnalysisContext.from_signal(signal, sampling_frequency, analysis_rate, signal_type)
+        self.sampling_frequency = self.context.analysis_rate
+        self.metric_names = select_metrics(metrics, self.METRICS)
+        self._values = {}
+
+    @property
+    def signal(self):
+        """
+        Returns the filtered signal of the context, filtering it on first use.
+        """
+        return self.context.filtered_signal
+
+    @property
+    def r_peaks(self):
+        """
+        Returns the peaks of the context, detecting them on first use.
+        """
+        return self.context.r_peaks
+
+    def _calculate(self, names):
+        """
+        Calculates the given parameters that are not known yet in one pass.
+
+        Parameters
+        ----------
+        self : TimeDomain
+        names : iterable of str
+            The parameters.
+
+        Returns
+        -------
+        dict: Parameter name -> value for the given names.
+        """
+        missing = [name for name in names if name not in self._values]
+        if missing:
+            rr_intervals = [self.context.rr_intervals] if RR_METRICS.intersection(missing) else None
+            row = time_domain_batch(self.signal, rr_intervals, self.sampling_frequency, fields=missing)[0]
+            self._values.update((name, row[name].item()) for name in missing)
+        return {name: self._values[name] for name in names}
+
+    def _metric(self, name):
+        """
+        Returns a single parameter, calculating it on first use.
+        """
+        return self._calculate((name,))[name]
+
+    @cached_property
+    def metrics(self):
+        """
+        Calculates the selected time domain parameters in one pass.
+
+        Returns
+        -------
+        dict: Parameter name -> value.
+        """
+        return self._calculate(self.metric_names)
 
     def __str__(self):
         """
@@ -86,7 +335,7 @@ class TimeDomain:
         Returns
         -------
         dict
-            Dictionary with time domain parameters.
+            Dictionary with the selected time domain parameters.
         
         Keys and values:
         ----------------
@@ -112,23 +361,42 @@ class TimeDomain:
             The SDHR of the signal.
         """
 
-        ReturnDict = {
-            "RMSSD": self.RMSSD(),
-            "SDNN": self.SDNN(),
-            "NN50": self.NN50(),
-            "pNN50": self.pNN50(),
-            "NN20": self.NN20(),
-            "pNN20": self.pNN20(),
-            "SDRR": self.SDRR(),
-            "mRR": self.mRR(),
-            "mHRV": self.mHRV(),
-            "SDHR": self.SDHR()
-        }
+        ReturnDict = self.metrics
 
         json_dump = json.dumps(ReturnDict)
         return json_dump
 
 
+    def windowed(self, window_seconds=300, step_seconds=60):
+        """
+        Calculates all time domain parameters over sliding windows.
+
+        Parameters
+        ----------
+        self : TimeDomain
+        window_seconds : float
+            The length of the window [s].
+        step_seconds : float
+            The distance between the starts of consecutive windows [s].
+
+        Returns
+        -------
+        DataFrame: One row per window indexed by the window start [s].
+
+        Raises
+        ------
+        ValueError
+            If the window or the step is not positive.
+
+        """
+        return time_domain_windows(
+            self.signal,
+            self.r_peaks,
+            int(window_seconds * self.sampling_frequency),
+            int(step_seconds * self.sampling_frequency),
+            self.sampling_frequency,
+        )
+
     def RMSSD(self):
         """
         Calculates the Root Mean Square of Successive Differences (RMSSD) of the signal [ms].
@@ -146,7 +414,7 @@ class TimeDomain:
         None
 
         """
-        return np.sqrt(np.mean(np.diff(self.signal) ** 2))
+        return self._metric("RMSSD")
 
     def SDNN(self):
         """
@@ -165,7 +433,7 @@ class TimeDomain:
         None
 
         """
-        return np.std(self.signal)
+        return self._metric("SDNN")
 
     def NN50(self):
         """
@@ -184,7 +452,7 @@ class TimeDomain:
         None
 
         """
-        return len(np.where(np.diff(self.signal) > 50)[0])
+        return self._metric("NN50")
 
     def pNN50(self):
         """
@@ -203,7 +471,7 @@ class TimeDomain:
         None
 
         """
-        return self.NN50() / len(self.signal)
+        return self._metric("pNN50")
 
     def NN20(self):
         """
@@ -222,7 +490,7 @@ class TimeDomain:
         None
 
         """
-        return len(np.where(np.diff(self.signal) > 20)[0])
+        return self._metric("NN20")
 
     def pNN20(self):
         """
@@ -241,7 +509,7 @@ class TimeDomain:
         None
 
         """
-        return self.NN20() / len(self.signal)
+        return self._metric("pNN20")
 
     def SDRR(self):
         """
@@ -253,14 +521,14 @@ class TimeDomain:
 
         Returns
         -------
-        float: The SDRR of the signa [ms]l.
+        float: The SDRR of the signal [ms].
 
         Raises
         ------
         None
 
         """
-        return np.std(np.diff(self.r_peaks))
+        return self._metric("SDRR")
 
     def mRR(self):
         """
@@ -279,7 +547,7 @@ class TimeDomain:
         None
 
         """
-        return np.mean(np.diff(self.r_peaks))
+        return self._metric("mRR")
 
     def mHRV(self):
         """
@@ -298,7 +566,7 @@ class TimeDomain:
         None
 
         """
-        return 60 / self.mRR()
+        return self._metric("mHRV")
 
     def SDHR(self):
         """
@@ -317,10 +585,12 @@ class TimeDomain:
         None
 
         """
-        return 60 / np.std(self.signal)
+        return self._metric("SDHR")
 
 
 if __name__ == "__main__":
+    from matplotlib import pyplot as plt
+
     # Generate a time array
     time = np.arange(0, 10, 0.01)
 
@@ -331,7 +601,7 @@ if __name__ == "__main__":
     rr_intervals = 60 / hr
 
     # Generate a signal with beats
-    signal = scipy.signal.square(np.cumsum(rr_intervals) * 2 * np.pi)
+    signal = ss.square(np.cumsum(rr_intervals) * 2 * np.pi)
     signal = (signal + 1) / 2  # Scale to [0, 1]
 
     plt.plot(time, signal)
@@ -1,60 +1,256 @@
 # -*- coding: utf-8 -*
+"""
+Command line batch analysis of a directory of csv recordings.
 
-from path_handler import PathHandler
-from ABP._signal_preprocessing import SignalPreprocessing
+    python analysis.py analyze DIRECTORY [-c COLUMN] [-d {time,frequency}] [-j WORKERS] [-o OUTPUT] [--shard i/N]
+    python analysis.py merge OUTPUT SHARD_OUTPUT [SHARD_OUTPUT ...]
+
+With --shard i/N every file goes to exactly one of N shards by a hash of its
+name, so N machines sharing the directory can each run one shard and the
+shard outputs are merged afterwards. Run python analysis.py analyze --help
+for every option.
+"""
+import argparse
+import os
+import sys
+
+from ABP.analysis_context import select_metrics
+from ABP.backends import lazy_import
+from ABP.batch_runner import DOMAINS, BatchRunner
 from ABP.frequency_domain import FrequencyDomain
+from ABP.intermediate_cache import IntermediateCache
 from ABP.time_domain import TimeDomain
-from async_lru import alru_cache
-import pyhrv
-import re
+from path_handler import PathHandler
+from result_sink import ResultSink
+from result_store import ResultStore
+
+pd = lazy_import("pandas")
+
+DEFAULT_COLUMNS = ["abp_finger_mm_hg_[abp_finger_mm_Hg_]"]
+
+
+def parse_shard(text):
+    """parse a shard given as "i/N".
+
+    Args:
+        text (str): the 1-based shard index and the number of shards, e.g. "2/8".
+
+    Returns:
+        tuple: (index, count).
+
+    Raises:
+        argparse.ArgumentTypeError: if the text is not a valid shard.
+    """
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard {text!r}, expected i/N") from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard {text!r}, expected 1 <= i <= N")
+    return index, count
+
+
+def default_output(shard):
+    """get the default output file of a run.
+
+    The output is not written to the data directory, where it would be
+    picked up as a recording by the next run.
+
+    Args:
+        shard (tuple or None): (index, count) of the run.
+
+    Returns:
+        str: results.csv in the working directory, one file per shard when sharded.
+    """
+    if shard is None:
+        return "results.csv"
+    return f"results.shard-{shard[0]}-of-{shard[1]}.csv"
 
 
-PATH = r"C:\Users\damia\OneDrive\Pulpit\zdrowi"
-name = ["abp_finger_mm_hg_[abp_finger_mm_Hg_]"]
-for_ecg_analysis = ["ekg__[ekg__]"]
+def analyze(args):
+    """analyze the signals of a directory (of one shard) and write one row per signal.
 
-signals = PathHandler(PATH, name).signals
-file_names = PathHandler(PATH, name).all_alaized_files_names
-analized_names = PathHandler(PATH, name).all_alaized_names
+    Args:
+        args (argparse.Namespace): the options of the analyze command.
 
-x = FrequencyDomain(signals[0], 200, 256, 128)
+    Returns:
+        int: exit status, 0 even if single signals failed, they are reported in the errors column.
+    """
+    cache = None if args.no_cache else IntermediateCache(
+        args.cache or os.path.join(args.directory, ".analysis_cache"))
+    runner = BatchRunner(tuple(args.domain or ("time",)), args.sampling_frequency, args.window_size, args.overlap,
+                         args.workers, args.analysis_rate, args.frequency_method, args.metric, cache)
+    path_handler = PathHandler(args.directory, args.column or DEFAULT_COLUMNS, delimiter=args.delimiter,
+                               use_cache=args.signal_cache, lazy=True, shard=args.shard)
+    hashes = {file_name: entry["hash"] for file_name, entry in path_handler.manifest.entries.items()}
+    matching = path_handler.manifest.matching(path_handler.names_of_the_files_to_search_from)
+    output = args.output or default_output(args.shard)
 
-################Frequency Domain################
-#  TO TEXT FILE
+    store = ResultStore(args.store) if args.store else None
+    done = store.computed(runner.params) if store is not None else {}
 
-# for i, (j, file_name, analized_name) in enumerate(
-#         zip(
-#             signals, file_names, analized_names
-#         )):
-#     try:
-#         print(f"Index: {i}, File name: {file_name}, analized name: {analized_name}")
-#         print(f"Values: {FrequencyDomain(j, 200, 256, 128)}")
-#
-#         # Sanitize file_name and analized_name
-#         file_name = re.sub(r'[^\w\s]', '', file_name)
-#         analized_name = re.sub(r'[^\w\s]', '', analized_name)
-#
-#         with open(fr"{PATH}\results\{file_name}_{analized_name}.txt", "w") as f:
-#             f.write(str(FrequencyDomain(j, 200, 256, 128)))
-#     except Exception as e:
-#         print(f"An error occurred with signal {i} (name) {file_name}: {e}")
+    def stored(file_name, column):
+        return done.get((file_name, column)) == hashes[file_name]
 
-################Frequency Domain################
-#  TO CSV FILE
+    failed = 0
+    already_stored = 0
+    try:
+        # signals with a current row in the store are not even loaded
+        signals = path_handler.iter_signals(skip=stored if store is not None else None)
+        with ResultSink(output, runner.metric_columns) as sink:
+            for result in runner.imap(signals):
+                if result["errors"]:
+                    failed += 1
+                    errors = "; ".join(f"{domain}: {error}" for domain, error in result["errors"].items())
+                    print(f"An error occurred with signal {result['column_name']} of {result['file_name']}: "
+                          f"{errors}", file=sys.stderr)
+                if store is not None:
+                    store.add(result, runner.params, hashes[result["file_name"]])
+                sink.add(result)
+            # skipped signals get their stored row, so the output covers every requested signal
+            if store is not None:
+                rows = store.results(runner.params)
+                for file_name, columns in matching:
+                    for column in columns:
+                        if stored(file_name, column):
+                            sink.add_row(file_name, column, *rows[(file_name, column)])
+                            already_stored += 1
+    finally:
+        if store is not None:
+            store.close()
+
+    shard = "" if args.shard is None else f" (shard {args.shard[0]}/{args.shard[1]})"
+    print(f"Files: {len(matching)}{shard}, computed: {sink.rows_written - already_stored}, failed: {failed}, "
+          f"already stored: {already_stored} -> {output}")
+    if cache is not None:
+        print(f"Cache: {runner.cache_stats['hits']} hits, {runner.cache_stats['misses']} misses")
+    return 0
+
+
+def read_results(path):
+    """read an output of the analyze command.
+
+    Args:
+        path (str): a .csv or .parquet file.
+
+    Returns:
+        DataFrame: one row per signal.
+    """
+    if os.path.splitext(path)[1].lower() == ".parquet":
+        return pd.read_parquet(path)
+    frame = pd.read_csv(path, dtype={column: "string" for column in ResultSink.KEY_COLUMNS + (ResultSink.ERROR_COLUMN,)})
+    frame[ResultSink.ERROR_COLUMN] = frame[ResultSink.ERROR_COLUMN].fillna("")
+    return frame
+
+
+def merge(args):
+    """merge the outputs of the shards of a run into one file.
+
+    Args:
+        args (argparse.Namespace): the options of the merge command.
 
+    Returns:
+        int: exit status.
+    """
+    frame = pd.concat([read_results(path) for path in args.inputs], ignore_index=True)
+    # a signal analyzed twice (e.g. a rerun shard) keeps its last row
+    frame = frame.drop_duplicates(list(ResultSink.KEY_COLUMNS), keep="last")
+    frame = frame.sort_values(list(ResultSink.KEY_COLUMNS), kind="stable")
+    for metric in ResultSink.INTEGER_METRICS:
+        if metric in frame.columns:
+            frame[metric] = frame[metric].astype("Int64")
+    if os.path.splitext(args.output)[1].lower() == ".parquet":
+        frame.to_parquet(args.output, index=False)
+    else:
+        frame.to_csv(args.output, index=False)
+    print(f"Merged {len(args.inputs)} files, {len(frame)} rows -> {args.output}")
+    return 0
 
 
-################Time Domain################
+def build_parser():
+    """build the command line parser.
 
-for i, (j, file_name, analized_name) in enumerate(
-        zip(
-            signals, file_names, analized_names
-        )):
+    Returns:
+        argparse.ArgumentParser: the parser with the analyze and merge commands.
+    """
+    parser = argparse.ArgumentParser(prog="analysis.py", description="Batch analysis of ABP and ECG recordings.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("analyze", help="analyze the csv files of a directory",
+                                  description="Analyze the csv files of a directory, one output row per signal.")
+    command.add_argument("directory", help="directory with the csv files")
+    command.add_argument("-c", "--column", action="append",
+                         help=f"column to analyze, repeat for several (default: {DEFAULT_COLUMNS[0]}); "
+                              "columns mentioning ecg or ekg are analyzed as ECG")
+    command.add_argument("-d", "--domain", action="append", choices=DOMAINS,
+                         help="domain to compute, repeat for both (default: time)")
+    command.add_argument("-m", "--metric", action="append",
+                         help="metric to compute, repeat for several (default: every metric of the domains)")
+    command.add_argument("--sampling-frequency", type=int, default=200, help="sampling frequency [Hz] (default: 200)")
+    command.add_argument("--window-size", type=int, default=256, help="size of the window (default: 256)")
+    command.add_argument("--overlap", type=int, default=128, help="overlap of the windows (default: 128)")
+    command.add_argument("--analysis-rate", type=int,
+                         help="rate the signals are decimated to before the analysis [Hz] (default: no decimation)")
+    command.add_argument("--frequency-method", choices=FrequencyDomain.METHODS, default="pyhrv",
+                         help="PSD backend of the frequency domain (default: pyhrv)")
+    command.add_argument("--delimiter", default=";",
+                         help="delimiter of the csv files when it can not be detected (default: ;)")
+    command.add_argument("-j", "--workers", type=int, help="number of worker processes (default: every core)")
+    command.add_argument("-o", "--output",
+                         help="output file, .parquet for Parquet, otherwise CSV "
+                              "(default: results.csv, results.shard-i-of-N.csv with --shard)")
+    command.add_argument("--shard", type=parse_shard, metavar="i/N",
+                         help="analyze only the i-th of N disjoint slices of the files, 1 <= i <= N")
+    command.add_argument("--store",
+                         help="SQLite file keeping every result, signals with a current row are not recomputed "
+                              "but written from the store; "
+                              "use one local file per shard")
+    command.add_argument("--cache",
+                         help="directory of the cache of filtered signals and beats "
+                              "(default: .analysis_cache in the directory)")
+    command.add_argument("--no-cache", action="store_true", help="do not cache filtered signals and beats")
+    command.add_argument("--signal-cache", action="store_true",
+                         help="keep cleaned signals as .npy files next to the csv files")
+    command.set_defaults(function=analyze)
+
+    command = commands.add_parser("merge", help="merge the outputs of the shards of a run",
+                                  description="Merge the outputs of the shards of a run into one file.")
+    command.add_argument("output", help="merged file, .parquet for Parquet, otherwise CSV")
+    command.add_argument("inputs", nargs="+", help="outputs of the shards")
+    command.set_defaults(function=merge)
+    return parser
+
+
+def main(argv=None):
+    """run the command line.
+
+    Args:
+        argv (list, optional): the arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: exit status.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "analyze":
+        if not os.path.isdir(args.directory):
+            parser.error(f"{args.directory} is not a directory")
+        if args.workers is not None and args.workers < 1:
+            parser.error("--workers must be at least 1")
+        try:
+            select_metrics(args.metric, TimeDomain.METRICS + FrequencyDomain.METRICS)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        missing = [path for path in args.inputs if not os.path.isfile(path)]
+        if missing:
+            parser.error(f"missing shard outputs: {', '.join(missing)}")
     try:
-        if i == 0:
-            with open(fr"{PATH}\frequency_domain.csv", "a") as file:
-                file.write("file_name, analized_name, {RMSSD, }\n")
-        with open(fr"{PATH}\time_domain_results.csv", "a") as file:
-            file.write(f"{file_name}, {analized_name}, {TimeDomain(j)}\n")
-    except Exception as e:
-        print(f"An error occurred with signal {i} (name) {file_name}: {e}")
+        return args.function(args)
+    except ImportError as e:
+        # e.g. a .parquet output without pyarrow
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*
+import multiprocessing
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, Signal, Slot
+
+from path_handler import PathHandler
+from ABP.batch_runner import BatchRunner
+
+
+class WorkerSignals(QObject):
+    """
+    This class holds the signals of AnalysisWorker, a QRunnable cannot emit signals itself.
+
+    Signals
+    -------
+    found(list, int)
+        The files with a searched column and the number of signals to analyze.
+    progress(int, int, str)
+        The number of analyzed signals, the total and the file just finished.
+    result(object)
+        One result of analyze_signal.
+    failed(str)
+        The files could not be read.
+    finished(bool)
+        The run ended, True if it was cancelled.
+    """
+
+    found = Signal(list, int)
+    progress = Signal(int, int, str)
+    result = Signal(object)
+    failed = Signal(str)
+    finished = Signal(bool)
+
+
+class AnalysisWorker(QRunnable):
+    """
+    This class runs the analysis of a directory off the GUI thread.
+
+    The worker runs in a QThreadPool thread and only drives BatchRunner, which
+    spreads the signals over worker processes, so the GUI thread stays free to
+    paint and handle clicks. Results and progress are reported per signal
+    through the signals of WorkerSignals. Qt runs threads of its own, so the
+    worker processes are started with forkserver (spawn where it is missing)
+    instead of being forked from the GUI process.
+
+    Attributes
+    ----------
+    signals : WorkerSignals
+        The signals of the worker.
+
+    Methods
+    -------
+    run()
+        Reads the directory and analyzes every signal.
+    cancel()
+        Stops the run after the signals already being analyzed.
+    """
+
+    def __init__(self, path, names, domains, sampling_frequency, window_size, overlap, max_workers=None):
+        """
+        Parameters
+        ----------
+        path : str
+            The directory with the csv files.
+        names : list of str
+            The columns to analyze.
+        domains : tuple
+            Any of "time" and "frequency".
+        sampling_frequency : int
+            The sampling frequency of the signals [Hz].
+        window_size : int
+            The size of the window.
+        overlap : int
+            The overlap of the window.
+        max_workers : int, optional
+            Number of worker processes, None uses every core.
+
+        Returns
+        -------
+        None
+        """
+        super().__init__()
+        self.signals = WorkerSignals()
+        self.path = path
+        self.names = names
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.runner = BatchRunner(tuple(domains), sampling_frequency, window_size, overlap, max_workers,
+                                  start_method=start_method)
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """
+        Stops the run, signals that have not started are dropped.
+
+        Returns
+        -------
+        None
+        """
+        self._cancelled.set()
+
+    @Slot()
+    def run(self):
+        """
+        Reads the directory and analyzes every signal, emitting the results one by one.
+
+        Returns
+        -------
+        None
+        """
+        try:
+            path_handler = PathHandler(self.path, self.names, lazy=True)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            self.signals.finished.emit(False)
+            return
+
+        matching = path_handler.manifest.matching(self.names)
+        total = sum(len(columns) for _, columns in matching)
+        self.signals.found.emit([file_name for file_name, _ in matching], total)
+
+        results = self.runner.imap(path_handler.iter_signals())
+        try:
+            for done, result in enumerate(results, start=1):
+                self.signals.result.emit(result)
+                self.signals.progress.emit(done, total, result["file_name"])
+                if self._cancelled.is_set():
+                    break
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        finally:
+            results.close()
+        self.signals.finished.emit(self._cancelled.is_set())
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*
+"""
+Compares the serial analysis loop with BatchRunner on a process pool.
+
+Usage: python benchmarks/bench_batch.py [signals] [workers]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ABP.batch_runner import BatchRunner
+
+
+def synthetic_signals(count, seconds=300, sampling_frequency=200):
+    """
+    Generates ABP-like pulse trains with a slowly varying heart rate.
+
+    Parameters
+    ----------
+    count : int
+        Number of signals.
+    seconds : int
+        Length of every signal [s].
+    sampling_frequency : int
+        The sampling frequency [Hz].
+
+    Returns
+    -------
+    list: (file name, column name, signal) tuples.
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(0, seconds, 1 / sampling_frequency)
+    items = []
+    for i in range(count):
+        rate = 1.1 + 0.1 * np.sin(2 * np.pi * 0.1 * t) + 0.05 * np.sin(2 * np.pi * 0.25 * t)
+        phase = np.cumsum(rate) / sampling_frequency
+        signal = 80 + 40 * np.sin(np.pi * phase) ** 8 + rng.normal(size=len(t))
+        items.append((f"recording_{i}.csv", "abp", signal))
+    return items
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    items = synthetic_signals(count)
+
+    start = time.perf_counter()
+    serial = BatchRunner(("time", "frequency"), max_workers=1).run(items)
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = BatchRunner(("time", "frequency"), max_workers=workers).run(items)
+    parallel_time = time.perf_counter() - start
+
+    assert [r["file_name"] for r in serial] == [r["file_name"] for r in parallel]
+    assert [r["time"] for r in serial] == [r["time"] for r in parallel]
+
+    print(f"{'':#^40}")
+    print(f"{'BATCH RUNNER BENCHMARK':#^40}")
+    print(f"{'':#^40}")
+    print(f"signals            -> {count}")
+    print(f"serial             -> {serial_time:.3f} s")
+    print(f"{f'{workers} workers':<19}-> {parallel_time:.3f} s ({serial_time / parallel_time:.1f}x)")
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*
+"""
+Compares the native ABP onset and ECG R-peak detectors with biosppy on
+synthetic traces: agreement of the beats and throughput in samples per second.
+
+Usage: python benchmarks/bench_beats.py [hours]
+"""
+import os
+import sys
+import time
+
+import biosppy.signals.abp
+import biosppy.signals.ecg
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ABP.beat_detection import abp_onsets, ecg_r_peaks
+
+SAMPLING_RATE = 200
+
+
+def abp_trace(seconds, period=0.8, noise=1.0, sampling_rate=SAMPLING_RATE, seed=0):
+    """
+    Generates an ABP trace with variable beat intervals, a dicrotic wave and baseline wander.
+
+    Parameters
+    ----------
+    seconds : float
+        The duration of the trace [s].
+    period : float
+        The mean beat interval [s].
+    noise : float
+        The standard deviation of the added white noise [mmHg].
+    sampling_rate : int
+        The sampling frequency [Hz].
+    seed : int
+        The random seed.
+
+    Returns
+    -------
+    tuple[array, array]: The trace and the indices of the true onsets.
+    """
+    rng = np.random.default_rng(seed)
+    count = int(seconds / period * 1.2)
+    onsets = np.cumsum(period * (1 + 0.05 * np.sin(2 * np.pi * 0.1 * np.arange(count)))
+                       + 0.02 * rng.normal(size=count))
+    onsets = onsets[onsets < seconds - 1.5]
+    length = int(seconds * sampling_rate)
+    pulse_time = np.arange(int(1.5 * sampling_rate)) / sampling_rate
+    pulse = (20 * (pulse_time / 0.12) ** 2 * np.exp(2 * (1 - pulse_time / 0.12))
+             + 4 * np.exp(-((pulse_time - 0.4 * np.sqrt(period)) / 0.06) ** 2))
+    starts = (onsets * sampling_rate).astype(int)
+    indices = (starts[:, np.newaxis] + np.arange(len(pulse))).ravel()
+    trace = np.bincount(indices, weights=np.tile(pulse, len(starts)), minlength=length)
+    time_axis = np.arange(length) / sampling_rate
+    trace = 80 + trace * (1 + 0.3 * np.sin(2 * np.pi * time_axis / 60))
+    trace += 5 * np.sin(2 * np.pi * 0.05 * time_axis) + noise * rng.normal(size=length)
+    return trace, starts
+
+
+def ecg_trace(seconds, period=0.8, noise=0.05, sampling_rate=SAMPLING_RATE, seed=0, inverted=False):
+    """
+    Generates an ECG with variable beat intervals, baseline wander and mains interference.
+
+    Parameters
+    ----------
+    seconds : float
+        The duration of the trace [s].
+    period : float
+        The mean beat interval [s].
+    noise : float
+        The standard deviation of the added white noise [mV].
+    sampling_rate : int
+        The sampling frequency [Hz].
+    seed : int
+        The random seed.
+    inverted : bool
+        Whether the lead is inverted.
+
+    Returns
+    -------
+    tuple[array, array]: The trace and the indices of the true R-peaks.
+    """
+    rng = np.random.default_rng(seed)
+    count = int(seconds / period * 1.2)
+    peaks = np.cumsum(period * (1 + 0.05 * np.sin(2 * np.pi * 0.1 * np.arange(count)))
+                      + 0.02 * rng.normal(size=count))
+    peaks = peaks[(peaks > 0.5) & (peaks < seconds - 0.6)]
+    length = int(seconds * sampling_rate)
+    beat_time = np.arange(int(-0.4 * sampling_rate), int(0.6 * sampling_rate)) / sampling_rate
+    waves = ((0.15, -0.2, 0.03), (-0.1, -0.03, 0.01), (1.0, 0.0, 0.012), (-0.25, 0.03, 0.01),
+             (0.35, 0.3 * np.sqrt(period), 0.05))
+    beat = sum(amplitude * np.exp(-((beat_time - centre) / width) ** 2) for amplitude, centre, width in waves)
+    starts = (peaks * sampling_rate).astype(int)
+    indices = (starts[:, np.newaxis] + np.round(beat_time * sampling_rate).astype(int)).ravel()
+    trace = np.bincount(indices, weights=np.tile(beat, len(starts)), minlength=length)
+    time_axis = np.arange(length) / sampling_rate
+    trace += 0.3 * np.sin(2 * np.pi * 0.2 * time_axis) + 0.05 * np.sin(2 * np.pi * 50 * time_axis)
+    trace += noise * rng.normal(size=length)
+    return (-trace if inverted else trace), starts
+
+
+def agreement(detected, reference, tolerance):
+    """
+    Returns the share of reference beats with a detected beat within tolerance samples.
+    """
+    if len(detected) == 0 or len(reference) == 0:
+        return 0.0
+    position = np.clip(np.searchsorted(detected, reference), 1, len(detected) - 1)
+    distance = np.minimum(np.abs(detected[position] - reference), np.abs(detected[position - 1] - reference))
+    return float(np.mean(distance <= tolerance))
+
+
+def timed(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+
+    print(f"{'':#^72}")
+    print(f"{'ABP ONSET BENCHMARK':#^72}")
+    print(f"{'':#^72}")
+    print(f"{'period':>7} {'noise':>6} {'beats':>6} {'native':>8} {'biosppy':>8} {'n.extra':>8} {'b.extra':>8}"
+          f" {'agree':>7} {'t.agree':>8}")
+    for period in (0.4, 0.8, 1.5):
+        for noise in (1.0, 4.0):
+            trace, true = abp_trace(300, period, noise)
+            native = abp_onsets(trace, SAMPLING_RATE)
+            reference = biosppy.signals.abp.abp(trace, SAMPLING_RATE, show=False)["onsets"]
+            # biosppy onsets at a true onset, the ones both detectors should report
+            found = reference[[agreement(true, [onset], 20) == 1 for onset in reference]]
+            print(f"{period:>7} {noise:>6} {len(true):>6} {agreement(native, true, 20):>8.1%}"
+                  f" {agreement(reference, true, 20):>8.1%}"
+                  f" {round((1 - agreement(true, native, 20)) * len(native)):>8}"
+                  f" {round((1 - agreement(true, reference, 20)) * len(reference)):>8}"
+                  f" {agreement(native, reference, 3):>7.1%} {agreement(native, found, 3):>8.1%}")
+    print("native / biosppy -> share of true onsets found within 0.1 s")
+    print("n.extra / b.extra -> native / biosppy onsets farther than 0.1 s from every true onset")
+    print("agree -> share of biosppy onsets matched by the native detector within 3 samples")
+    print("t.agree -> the same for the biosppy onsets within 0.1 s of a true onset")
+
+    print(f"{'':#^72}")
+    print(f"{'ECG R-PEAK BENCHMARK':#^72}")
+    print(f"{'':#^72}")
+    print(f"{'period':>7} {'noise':>6} {'lead':>9} {'beats':>6} {'native':>8} {'hamilton':>9}")
+    for period in (0.4, 0.8, 1.5):
+        for noise in (0.05, 0.2):
+            for inverted in (False, True):
+                trace, true = ecg_trace(300, period, noise, inverted=inverted)
+                native = ecg_r_peaks(trace, SAMPLING_RATE)
+                reference = biosppy.signals.ecg.ecg(trace, SAMPLING_RATE, show=False)["rpeaks"]
+                lead = "inverted" if inverted else "upright"
+                print(f"{period:>7} {noise:>6} {lead:>9} {len(true):>6} {agreement(native, true, 6):>8.1%}"
+                      f" {agreement(reference, true, 6):>9.1%}")
+    print("native / hamilton -> share of true R-peaks found within 30 ms")
+
+    print(f"{'':#^72}")
+    print(f"{'THROUGHPUT':#^72}")
+    print(f"{'':#^72}")
+    detectors = (
+        ("abp native", abp_trace, lambda trace: abp_onsets(trace, SAMPLING_RATE)),
+        ("abp biosppy", abp_trace, lambda trace: biosppy.signals.abp.abp(trace, SAMPLING_RATE, show=False)),
+        ("ecg native", ecg_trace, lambda trace: ecg_r_peaks(trace, SAMPLING_RATE)),
+        ("ecg hamilton", ecg_trace,
+         lambda trace: biosppy.signals.ecg.hamilton_segmenter(trace, SAMPLING_RATE)),
+    )
+    print(f"{hours:g} h, {int(hours * 3600 * SAMPLING_RATE)} samples")
+    for name, generator, detector in detectors:
+        trace, _ = generator(hours * 3600)
+        elapsed, _ = timed(lambda: detector(trace), repeat=1 if "native" not in name else 3)
+        print(f"    {name:<13} {elapsed:>8.3f} s {len(trace) / elapsed / 1e6:>8.2f} Msamples/s")
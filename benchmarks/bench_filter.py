@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*
+"""
+Times forward-backward FIR filtering with biosppy and with FilterBank's direct
+and FFT (overlap-add) convolution, and reports where FFT starts to win.
+
+Usage: python benchmarks/bench_filter.py [samples]
+"""
+import os
+import sys
+import time
+
+import biosppy
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ABP._signal_preprocessing import FilterBank
+
+ORDERS = (30, 60, 120, 250, 500, 1000)
+
+
+def timed(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    signal = np.cumsum(np.random.default_rng(0).normal(size=samples))
+
+    print(f"{'':#^62}")
+    print(f"{'FIR FILTER BENCHMARK':#^62}")
+    print(f"{'':#^62}")
+    print(f"samples -> {samples}")
+    print(f"{'order':>6} {'taps':>6} {'biosppy':>10} {'direct':>10} {'fft':>10} {'auto':>10}")
+
+    crossover = None
+    for order in ORDERS:
+        arguments = ('FIR', 'bandpass', order, [0.5, 40], 200)
+        biosppy_time = timed(lambda: biosppy.signals.tools.filter_signal(
+            signal, ftype='FIR', band='bandpass', order=order, frequency=[0.5, 40], sampling_rate=200))
+        direct_time = timed(lambda: FilterBank.filter(signal, *arguments, method='direct'))
+        fft_time = timed(lambda: FilterBank.filter(signal, *arguments, method='fft'))
+        auto_time = timed(lambda: FilterBank.filter(signal, *arguments))
+        taps = 2 * len(FilterBank.coefficients(*arguments)[0]) - 1
+        if crossover is None and fft_time < direct_time:
+            crossover = taps
+        print(f"{order:>6} {taps:>6} {biosppy_time:>10.4f} {direct_time:>10.4f} {fft_time:>10.4f} {auto_time:>10.4f}")
+
+    print(f"fft faster from -> {crossover} zero-phase taps (FFT_MIN_KERNEL = {FilterBank.FFT_MIN_KERNEL})")
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*
+"""
+Compares the columnar PathHandler ingest with the previous per-element path.
+
+Usage: python benchmarks/bench_ingest.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from path_handler import PathHandler
+
+ABP = 'abp_finger_mm_hg_[abp_finger_mm_Hg_]'
+ECG = 'ekg__[ekg__]'
+
+
+def write_recording(path, rows):
+    """
+    Writes a synthetic ';' separated recording with ',' decimals.
+
+    Parameters
+    ----------
+    path : str
+        Destination csv file.
+    rows : int
+        Number of samples.
+
+    Returns
+    -------
+    None
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(rows) / 200
+    frame = pd.DataFrame({
+        'DateTime': np.round(t, 3),
+        ABP: 80 + 40 * np.sin(np.pi * 1.2 * t) ** 8 + rng.normal(size=rows),
+        ECG: rng.normal(size=rows),
+        'icp[mmHg]': rng.normal(size=rows),
+    })
+    frame.to_csv(path, sep=';', decimal=',', index=False)
+
+
+def legacy_ingest(path, names, delimiter=';'):
+    """
+    The ingest path used before the columnar reader: every column parsed as text,
+    then one Python float per sample.
+
+    Parameters
+    ----------
+    path : str
+        Directory with the csv files.
+    names : list
+        Searched column names.
+    delimiter : str
+        Csv delimiter.
+
+    Returns
+    -------
+    list: list of cleaned signals (lists of floats).
+    """
+    signals = {i: pd.read_csv(fr"{path}/{i}", delimiter=delimiter)
+               for i in os.listdir(path) if i.endswith('.csv')}
+    cleaned = []
+    for frame in signals.values():
+        for name in names:
+            if name in frame.columns:
+                column = frame[name].dropna()
+                cleaned.append([float(i.replace(',', '.')) for i in column if i != 0])
+    return cleaned
+
+
+def timed(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(2):
+            write_recording(os.path.join(directory, f"recording_{i}.csv"), rows)
+
+        legacy_time, legacy = timed(lambda: legacy_ingest(directory, [ABP]))
+        new_time, handler = timed(lambda: PathHandler(directory, [ABP]))
+        new32_time, _ = timed(lambda: PathHandler(directory, [ABP], dtype=np.float32))
+
+        for old, new in zip(legacy, handler.signals):
+            np.testing.assert_allclose(old, new)
+
+    print(f"{'':#^40}")
+    print(f"{'CSV INGEST BENCHMARK':#^40}")
+    print(f"{'':#^40}")
+    print(f"rows per file      -> {rows}")
+    print(f"legacy             -> {legacy_time:.3f} s")
+    print(f"columnar float64   -> {new_time:.3f} s ({legacy_time / new_time:.1f}x)")
+    print(f"columnar float32   -> {new32_time:.3f} s ({legacy_time / new32_time:.1f}x)")
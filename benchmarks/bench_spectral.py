@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*
+"""
+Times the PSD backends of FrequencyDomain on 5-minute and 24-hour beat series.
+
+Usage: python benchmarks/bench_spectral.py
+"""
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pyhrv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ABP.spectral import ar_band_powers, lomb_band_powers, tachogram, welch_band_powers
+
+
+def nn_series(seconds, missing=0.0, seed=0):
+    """
+    Generates NN intervals with LF and HF modulation, optionally dropping beats.
+
+    Parameters
+    ----------
+    seconds : int
+        The duration of the series [s].
+    missing : float
+        The fraction of beats removed (their intervals are merged).
+    seed : int
+        The random seed.
+
+    Returns
+    -------
+    array: The NN intervals [ms].
+    """
+    rng = np.random.default_rng(seed)
+    beats = np.arange(0, seconds, 0.85)
+    nn = 850 + 40 * np.sin(2 * np.pi * 0.1 * beats) + 20 * np.sin(2 * np.pi * 0.25 * beats)
+    nn += 10 * rng.normal(size=len(nn))
+    times = np.cumsum(nn)
+    keep = rng.random(len(times)) >= missing
+    return np.diff(np.concatenate(([0.0], times[keep])))
+
+
+def timed(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    backends = {
+        "pyhrv welch": lambda nn: pyhrv.frequency_domain.welch_psd(
+            nni=nn, show=False, show_param=False, legend=False)["fft_abs"],
+        "built-in welch": lambda nn: welch_band_powers([tachogram(nn)], 256, 128)[0],
+        "lomb-scargle": lambda nn: lomb_band_powers([nn])[0],
+        "burg ar": lambda nn: ar_band_powers([tachogram(nn)])[0],
+    }
+
+    print(f"{'':#^72}")
+    print(f"{'SPECTRAL BACKEND BENCHMARK':#^72}")
+    print(f"{'':#^72}")
+    for label, seconds in (("5 min", 300), ("24 h", 24 * 3600)):
+        for missing in (0.0, 0.05):
+            nn = nn_series(seconds, missing)
+            print(f"{label}, {len(nn)} beats, {missing:.0%} missing")
+            for name, backend in backends.items():
+                elapsed, powers = timed(lambda: backend(nn), repeat=1 if seconds > 300 else 3)
+                vlf, lf, hf = powers
+                print(f"    {name:<15} {elapsed:>8.4f} s   LF/HF {lf / hf:>6.2f}")
+
+    # 24 hours scored in 5-minute epochs: one Burg fit per epoch against one batched fit
+    series = tachogram(nn_series(24 * 3600))
+    epoch = 300 * 4
+    epochs = series[:len(series) // epoch * epoch].reshape(-1, epoch)
+    print(f"24 h in {len(epochs)} epochs of 5 min")
+    elapsed, _ = timed(lambda: [ar_band_powers([e]) for e in epochs], repeat=1)
+    print(f"    {'per epoch':<15} {elapsed:>8.4f} s")
+    elapsed, _ = timed(lambda: ar_band_powers(epochs), repeat=1)
+    print(f"    {'batched':<15} {elapsed:>8.4f} s")
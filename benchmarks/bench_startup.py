@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*
+"""
+Measures the import time of the entry modules with python -X importtime and
+fails when one of them exceeds its budget or imports an analysis backend
+(scipy, pandas, biosppy, pyhrv, matplotlib, sympy) at startup.
+
+Usage: python benchmarks/bench_startup.py [repeat]
+Exits with status 1 on a regression.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds, about three times the import time on a laptop, numpy and PySide6 included
+BUDGETS = {
+    "ABP.time_domain": 0.5,
+    "ABP.frequency_domain": 0.5,
+    "ABP.batch_runner": 0.5,
+    "ABP.signal_ploting": 0.5,
+    "result_store": 0.5,
+    "analysis": 0.5,
+    "analysis_worker": 1.0,
+    "mainwindow": 1.5,
+}
+BACKENDS = ("scipy", "pandas", "biosppy", "pyhrv", "matplotlib", "sympy")
+TOP = 5
+
+
+def import_times(module):
+    """
+    Imports a module in a fresh interpreter.
+
+    Parameters
+    ----------
+    module : str
+        The name of the module.
+
+    Returns
+    -------
+    dict: Imported module name -> (self, cumulative) import time [s].
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             cwd=ROOT, capture_output=True, text=True,
+                             env=dict(os.environ, PYTHONPATH=ROOT, QT_QPA_PLATFORM="offscreen"))
+    if process.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{process.stderr[-2000:]}")
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print(f"{'':#^62}")
+    print(f"{'STARTUP BENCHMARK':#^62}")
+    print(f"{'':#^62}")
+    print(f"repeat -> {repeat}")
+    print(f"{'module':<24} {'import [s]':>10} {'budget [s]':>10}  heaviest imports [s]")
+
+    failures = []
+    for module, budget in BUDGETS.items():
+        runs = [import_times(module) for _ in range(repeat)]
+        total = statistics.median(times[module][1] for times in runs)
+        heaviest = sorted(runs[0].items(), key=lambda item: item[1][0], reverse=True)[:TOP]
+        print(f"{module:<24} {total:>10.3f} {budget:>10.3f}  "
+              + ", ".join(f"{name} {own:.3f}" for name, (own, _) in heaviest))
+        if total > budget:
+            failures.append(f"{module} imports in {total:.3f} s, budget {budget:.3f} s")
+        backends = sorted({name.split(".")[0] for name in runs[0]} & set(BACKENDS))
+        if backends:
+            failures.append(f"{module} imports {', '.join(backends)} at startup")
+
+    if failures:
+        print("FAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("OK")
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*
+"""
+Times drawing a long recording with a plain plot of every sample and with the
+SignalViewer min/max pyramid, at several zoom levels.
+
+Usage: python benchmarks/bench_viewer.py [hours]
+"""
+import os
+import sys
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ABP.signal_ploting import SignalPyramid, SignalViewer
+
+SAMPLING_RATE = 200
+SPANS = (86400, 3600, 60, 5)
+
+
+def timed(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    samples = int(hours * 3600 * SAMPLING_RATE)
+    signal = np.cumsum(np.random.default_rng(0).normal(size=samples))
+    beats = np.arange(0, samples, int(0.8 * SAMPLING_RATE))
+    duration = samples / SAMPLING_RATE
+
+    print(f"{'':#^62}")
+    print(f"{'SIGNAL VIEWER BENCHMARK':#^62}")
+    print(f"{'':#^62}")
+    print(f"samples -> {samples}")
+
+    start = time.perf_counter()
+    pyramid = SignalPyramid(signal)
+    print(f"pyramid -> {time.perf_counter() - start:.3f} s, {len(pyramid.levels)} levels, "
+          f"{sum(2 * minimums.nbytes for _, minimums, _ in pyramid.levels) / 1e6:.1f} MB")
+
+    figure, axes = plt.subplots(figsize=(10, 4))
+    viewer = SignalViewer(pyramid, SAMPLING_RATE, beats, axes=axes)
+    print(f"{'span [s]':>10} {'points':>8} {'beats':>8} {'redraw [s]':>12}")
+    for span in SPANS:
+        span = min(span, duration)
+        left = (duration - span) / 2
+
+        def redraw():
+            axes.set_xlim(left, left + span)
+            figure.canvas.draw()
+
+        redraw_time = timed(redraw)
+        print(f"{span:>10.0f} {len(viewer.line.get_xdata()):>8} {len(viewer.markers.get_xdata()):>8} "
+              f"{redraw_time:>12.4f}")
+
+    figure, axes = plt.subplots(figsize=(10, 4))
+    axes.plot(np.arange(samples) / SAMPLING_RATE, signal)
+    print(f"plain plot, full span -> {timed(figure.canvas.draw, repeat=1):.4f} s")
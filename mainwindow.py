@@ -1,19 +1,16 @@
 
 # This Python file uses the following encoding: utf-8
 import sys
-import pandas as pd
-import time
 
 from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QLabel, QVBoxLayout, QWidget, QFileDialog
-from PySide6.QtCore import Slot, Qt, QPoint
+from PySide6.QtCore import Slot, Qt, QPoint, QThreadPool, QTimer
 from ui_form import Ui_MainWindow
 
 import ast
 import webbrowser
 
-from path_handler import PathHandler
-from ABP.time_domain import TimeDomain
-from ABP.frequency_domain import FrequencyDomain
+from analysis_worker import AnalysisWorker
+from results_model import ResultsTableModel
 
 
 class MainWindow(QMainWindow):
@@ -29,7 +26,10 @@ class MainWindow(QMainWindow):
     -------
     __init__ - initialize the class.
     buttons - connect the buttons.
-    check_values - check if the values are not empty.
+    check_values - check if the values are not empty and start the analysis.
+    cancel_analysis - cancel the running analysis.
+    on_found, on_progress, on_result, on_failed, on_finished - handle the worker signals.
+    flush_results - insert the buffered results into the results table.
     download_data - download the data from the GUI.
     connect_checkbox - connect the checkbox.
     on_time_checkbox_state_changed - check if the time checkbox is checked.
@@ -40,6 +40,8 @@ class MainWindow(QMainWindow):
     Parameters
     ----------
     """
+    RESULTS_INTERVAL = 100
+
     def __init__(self, parent=None):
         """
         Initialize the class.
@@ -75,6 +77,17 @@ class MainWindow(QMainWindow):
 
         self.ui.actionSave_to_file.setDisabled(True)
 
+        self.thread_pool = QThreadPool.globalInstance()
+        self.worker = None
+
+        # results are shown in a table view, buffered and inserted a batch at a time
+        self.results_model = ResultsTableModel(parent=self)
+        self.ui.resultsTable.setModel(self.results_model)
+        self.pending_results = []
+        self.results_timer = QTimer(self)
+        self.results_timer.setInterval(self.RESULTS_INTERVAL)
+        self.results_timer.timeout.connect(self.flush_results)
+
     def mousePressEvent(self, event):
         """
         Parameters
@@ -136,6 +149,7 @@ class MainWindow(QMainWindow):
         self.pushButton = QPushButton(self.centralwidget)
         self.pushButton = self.ui.analyze_button.clicked.connect(self.download_data)
         self.pushButton = self.ui.analyze_button.clicked.connect(self.check_values)
+        self.ui.cancel_button.clicked.connect(self.cancel_analysis)
 
     def check_values(self):
         """
@@ -171,40 +185,138 @@ class MainWindow(QMainWindow):
             # change the file names to the correct format
             lst = ast.literal_eval(self.file_names)
 
-            # create the path handler object
-            try:
-                ph = PathHandler(path, lst)
-                founded_files = ph.all_alaized_files_names
-                signals = ph.signals
-            except Exception as e:
-                self.label.setText(f"An error occurred: {e} - perhaps due to bad data format")
-                self.label.setStyleSheet("""
-                 color: #ff5757;
-                    font-size: 20px;
-                    """)
+            # files are read and analyzed off the GUI thread, results arrive one signal at a time
+            self.pending_results = []
+            self.results_model.set_domains(self.to_analyze)
+            self.results_timer.start()
+            self.worker = AnalysisWorker(path, lst, self.to_analyze, int(self.sampling_rate),
+                                         int(self.window_size), int(self.overlap))
+            self.worker.signals.found.connect(self.on_found)
+            self.worker.signals.progress.connect(self.on_progress)
+            self.worker.signals.result.connect(self.on_result)
+            self.worker.signals.failed.connect(self.on_failed)
+            self.worker.signals.finished.connect(self.on_finished)
+
+            self.ui.analyze_button.setDisabled(True)
+            self.ui.cancel_button.setDisabled(False)
+            self.ui.progressBar.setValue(0)
+            self.thread_pool.start(self.worker)
+
+    def cancel_analysis(self):
+        """
+        Cancel the running analysis, signals already being analyzed still finish.
+
+        Parameters
+        ----------
+        self :
+        Returns
+        -------
+        None
+        """
+        if self.worker is not None:
+            self.worker.cancel()
+            self.ui.cancel_button.setDisabled(True)
+            self.ui.statusbar.showMessage("Cancelling...")
+
+    @Slot(list, int)
+    def on_found(self, founded_files, total):
+        """
+        Show the files found by the worker.
+
+        Parameters
+        ----------
+        founded_files : list - the files with a searched column.
+        total : int - the number of signals to analyze.
+        Returns
+        -------
+        None
+        """
+        self.label.setText(f"Founded {len(founded_files)} files, {total} signals to analyze")
+        self.label.setToolTip("\n".join([str(n) for n in founded_files]))
+        self.ui.progressBar.setMaximum(max(total, 1))
+
+    @Slot(int, int, str)
+    def on_progress(self, done, total, file_name):
+        """
+        Show the progress of the analysis.
+
+        Parameters
+        ----------
+        done : int - the number of analyzed signals.
+        total : int - the number of signals to analyze.
+        file_name : str - the file just finished.
+        Returns
+        -------
+        None
+        """
+        self.ui.progressBar.setValue(done)
+        self.ui.statusbar.showMessage(f"Analyzed {done} of {total}: {file_name}")
+
+    @Slot(object)
+    def on_result(self, result):
+        """
+        Buffer the result of one signal until the next flush_results.
 
+        Parameters
+        ----------
+        result : dict - see ABP.batch_runner.analyze_signal.
+        Returns
+        -------
+        None
+        """
+        self.pending_results.append(result)
 
-            self.label.setText("Founded files: \n" + "\n,".join([str(n) for n in founded_files]))
+    def flush_results(self):
+        """
+        Insert the buffered results into the results table.
 
-            time.sleep(5)
+        Parameters
+        ----------
+        self :
+        Returns
+        -------
+        None
+        """
+        if self.pending_results:
+            results, self.pending_results = self.pending_results, []
+            self.results_model.append(results)
 
-            current_text = ""
+    @Slot(str)
+    def on_failed(self, message):
+        """
+        Show an error of the worker.
 
-            for i,j in signals, founded_files:
-                try:
-                    if "time" in self.to_analyze:
-                        td = TimeDomain(i)
-                        current_text = current_text + f"Time domain: {td}" + "\n"
-                except Exception as e:
-                     current_text = f"An error occurred with signal (name) {j}: {e}" + "\n"
-                try:
-                    if "frequency" in self.to_analyze:
-                        fd = FrequencyDomain(i, self.sampling_rate, self.window_size, self.overlap)
-                        current_text = current_text + f"Frequency domain: {fd}" + "\n"
-                except Exception as e:
-                    current_text = current_text + f"An error occurred with signal (name) {j}: {e}" + "\n"
+        Parameters
+        ----------
+        message : str - the error message.
+        Returns
+        -------
+        None
+        """
+        self.label.setText(f"An error occurred: {message} - perhaps due to bad data format")
+        self.label.setStyleSheet("""
+         color: #ff5757;
+            font-size: 20px;
+            """)
+
+    @Slot(bool)
+    def on_finished(self, cancelled):
+        """
+        Restore the buttons after the analysis.
 
-            self.label.setText(current_text)
+        Parameters
+        ----------
+        cancelled : bool - whether the analysis was cancelled.
+        Returns
+        -------
+        None
+        """
+        self.worker = None
+        self.results_timer.stop()
+        self.flush_results()
+        self.ui.analyze_button.setDisabled(False)
+        self.ui.cancel_button.setDisabled(True)
+        self.ui.statusbar.showMessage("Analysis cancelled" if cancelled else "Analysis finished")
 
 
     def download_data(self):
@@ -274,7 +386,7 @@ class MainWindow(QMainWindow):
 
     def save_to_file(self):
         """
-        Save the data to the file.
+        Save the results table to a CSV file.
 
         Parameters
         ----------
@@ -288,9 +400,9 @@ class MainWindow(QMainWindow):
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
         file_name, _ = QFileDialog.getSaveFileName(self, "QFileDialog.getSaveFileName()", "",
-                                                  "All Files (*);;Text Files (*.txt)", options=options)
-        with open(file_name, "w") as f:
-            f.write(self.label.text())
+                                                  "CSV Files (*.csv);;All Files (*)", options=options)
+        if file_name:
+            self.results_model.to_csv(file_name)
 
     def navigate(self):
         """
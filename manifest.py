@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*
+import csv
+import hashlib
+import json
+import os
+
+
+def shard_of(file_name, count):
+    """get the shard of a file, the same on every machine and Python version.
+
+    Args:
+        file_name (str): name of the csv file.
+        count (int): number of shards.
+
+    Returns:
+        int: shard number from 1 to count.
+    """
+    digest = hashlib.blake2b(file_name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+class DatasetManifest:
+    """
+    This class keeps a persistent description of every csv file in a data directory.
+
+    The manifest is built from the file headers only, stored next to the data and
+    on every refresh only new or changed files (different size or mtime) are rescanned.
+
+    With a shard (i, N) only the files with shard_of(file name, N) == i are
+    described and the manifest gets its own file, so N machines sharing the
+    directory scan disjoint files and never write the same manifest.
+
+    Attributes
+    ----------
+    path_to_a_directory : rawstr
+        The path to the directory with the data.
+    default_delimiter : str
+        The delimiter used when it can not be detected from the header.
+    shard : tuple or None
+        (index, count) of the described slice of the files, None for all files.
+    entries : dict
+        file name -> {size, mtime_ns, hash, columns, delimiter, rows}.
+
+    Methods
+    -------
+    refresh()
+        Rescans new and changed files and drops removed ones.
+    save()
+        Writes the manifest to the directory.
+    in_shard(file_name)
+        Returns whether a file belongs to the shard.
+    matching(names)
+        Returns the files having any of the searched columns.
+    """
+
+    FILE_NAME = ".manifest.json"
+    VERSION = 2
+    CHUNK_SIZE = 1 << 20
+    DELIMITERS = (";", ",", "\t", "|")
+
+    def __init__(self, path_to_a_directory, default_delimiter=';', shard=None):
+        """
+        Initialize the class and load the stored manifest if there is one.
+        Args:
+            path_to_a_directory (rawstring): path to the directory with the data.
+            default_delimiter (str, optional): delimiter used when detection fails. Defaults to ';'.
+            shard (tuple, optional): (index, count) with 1 <= index <= count, only
+                the files of this shard are described. Defaults to all files.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: if the shard is invalid.
+        """
+        if shard is not None:
+            index, count = shard
+            if not 1 <= index <= count:
+                raise ValueError("Invalid shard.")
+            shard = (int(index), int(count))
+        self.path_to_a_directory = path_to_a_directory
+        self.default_delimiter = default_delimiter
+        self.shard = shard
+        file_name = self.FILE_NAME
+        if shard is not None:
+            file_name = f".manifest.{shard[0]}-of-{shard[1]}.json"
+        self.manifest_path = os.path.join(path_to_a_directory, file_name)
+        self.entries = self._load()
+
+    def _load(self):
+        """load the stored manifest.
+
+        Returns:
+            dict: stored entries, empty if the manifest is missing or outdated.
+        """
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if stored.get("version") != self.VERSION:
+            return {}
+        return stored.get("files", {})
+
+    def save(self):
+        """write the manifest to the directory.
+
+        Returns:
+            None
+        """
+        temporary = self.manifest_path + ".tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "files": self.entries}, f, indent=1)
+            os.replace(temporary, self.manifest_path)
+        except OSError:
+            # read-only data directories still get the in-memory manifest
+            pass
+
+    def in_shard(self, file_name):
+        """check whether a file belongs to the shard.
+
+        Args:
+            file_name (str): name of the csv file.
+
+        Returns:
+            bool: True without a shard.
+        """
+        return self.shard is None or shard_of(file_name, self.shard[1]) == self.shard[0]
+
+    def refresh(self):
+        """rescan new and changed csv files and drop removed ones.
+
+        Returns:
+            DatasetManifest: self, to allow chaining.
+        """
+        changed = False
+        csv_files = sorted(file for file in os.listdir(self.path_to_a_directory)
+                           if file.endswith('.csv') and self.in_shard(file))
+
+        for file_name in set(self.entries) - set(csv_files):
+            del self.entries[file_name]
+            changed = True
+
+        for file_name in csv_files:
+            stat = os.stat(os.path.join(self.path_to_a_directory, file_name))
+            entry = self.entries.get(file_name)
+            if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                continue
+            self.entries[file_name] = self.scan_file(file_name, stat)
+            changed = True
+
+        if changed:
+            self.save()
+        return self
+
+    def scan_file(self, file_name, stat=None):
+        """describe a single csv file without parsing its data.
+
+        Args:
+            file_name (str): name of the csv file in the directory.
+            stat (os.stat_result, optional): stat of the file if already known.
+
+        Returns:
+            dict: size, mtime_ns, hash, columns, delimiter and rows of the file.
+        """
+        path = os.path.join(self.path_to_a_directory, file_name)
+        stat = stat or os.stat(path)
+
+        # utf-8-sig drops a byte order mark, which pandas does not keep in the first name either
+        with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+            header = f.readline()
+        delimiter = self._detect_delimiter(header)
+        columns = self._deduplicate(next(csv.reader([header], delimiter=delimiter), []))
+
+        digest = hashlib.blake2b(digest_size=16)
+        newlines = 0
+        last = b"\n"
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                digest.update(chunk)
+                newlines += chunk.count(b"\n")
+                last = chunk[-1:]
+        lines = newlines + (last != b"\n")
+
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest.hexdigest(),
+            "columns": columns,
+            "delimiter": delimiter,
+            "rows": max(lines - 1, 0),
+        }
+
+    @staticmethod
+    def _deduplicate(columns):
+        """name the columns the way pandas.read_csv does.
+
+        Empty names become "Unnamed: i" and repeated ones "x.1", "x.2", ...,
+        skipping suffixes already used by another column of the header.
+
+        Args:
+            columns (list): column names of the header.
+
+        Returns:
+            list: the names pandas gives the columns.
+        """
+        names = [column or f"Unnamed: {i}" for i, column in enumerate(columns)]
+        unnamed = [i for i, column in enumerate(columns) if not column]
+        counts = {}
+        # like pandas, the named columns keep their names before the unnamed ones are renamed
+        for i in [i for i in range(len(names)) if i not in unnamed] + unnamed:
+            column = original = names[i]
+            count = counts.get(column, 0)
+            while count > 0:
+                counts[original] = count + 1
+                column = f"{original}.{count}"
+                count = count + 1 if column in names else counts.get(column, 0)
+            names[i] = column
+            counts[column] = count + 1
+        return names
+
+    def _detect_delimiter(self, header):
+        """detect the delimiter from the header line.
+
+        Args:
+            header (str): first line of the file.
+
+        Returns:
+            str: detected delimiter or the default one.
+        """
+        if self.default_delimiter in header:
+            return self.default_delimiter
+        counts = {candidate: header.count(candidate) for candidate in self.DELIMITERS}
+        best = max(counts, key=counts.get)
+        return best if counts[best] else self.default_delimiter
+
+    def matching(self, names):
+        """get the files having any of the searched columns.
+
+        Args:
+            names (list): names of the searched columns.
+
+        Returns:
+            list: (file name, list of present columns in the order of names) tuples.
+        """
+        found = []
+        for file_name in sorted(self.entries):
+            columns = set(self.entries[file_name]["columns"])
+            present = [name for name in names if name in columns]
+            if present:
+                found.append((file_name, present))
+        return found
+
+
+if __name__ == "__main__":
+    path = r"C:\Users\damia\OneDrive\Pulpit\data"
+    manifest = DatasetManifest(path).refresh()
+    for name, entry in manifest.entries.items():
+        print(name, entry["rows"], entry["columns"])
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*
 import os
-import pandas as pd
+import numpy as np
+
+from ABP.backends import lazy_import
+from manifest import DatasetManifest
+from signal_cache import SignalCache
+
+pd = lazy_import("pandas")
 
 
 class PathHandler:
@@ -15,22 +21,42 @@ class PathHandler:
         The names of the files to search from.
     delimiter : str
         The delimiter of the csv files.
+    dtype : numpy.dtype
+        The floating point type of the returned signals.
+    manifest : DatasetManifest
+        Header-only description of the csv files in the directory (of the shard).
+    cache : SignalCache
+        Memory-mapped cache of cleaned signals, None if not used.
 
     Methods
     -------
     get_all_csv_files()
         Returns all csv files from the directory.
+    read_signal_columns(file_name, names)
+        Returns the requested columns of a single file.
+    load_signals(file_name, names)
+        Returns the cleaned signals of a single file, from the cache if possible.
+    iter_signals()
+        Yields the signals one file at a time.
     get_signals_from_files()
         Returns the signals from the files.
     """
 
-    def __init__(self, path_to_a_directory, names_of_variables, delimiter=';'):
+    CLEANER_VERSION = 1
+
+    def __init__(self, path_to_a_directory, names_of_variables, delimiter=';', dtype=np.float64, use_cache=False,
+                 lazy=False, shard=None):
         """
         Initialize the class.
         Args:
             path_to_a_directory (rawstring): path to the directory with the data.
             names_of_variables (string): names of the variables to search from.
             delimiter (str, optional): delimter in a csv file. Defaults to ';'.
+            dtype (numpy.dtype, optional): float32 or float64 type of the signals. Defaults to np.float64.
+            use_cache (bool, optional): memory-map cleaned signals from .npy sidecars. Defaults to False.
+            lazy (bool, optional): do not load the signals, use iter_signals() instead. Defaults to False.
+            shard (tuple, optional): (index, count), only the files of this shard are used,
+                see DatasetManifest. Defaults to all files.
 
         Returns:
             None
@@ -41,9 +67,22 @@ class PathHandler:
         self.path_to_a_directory = path_to_a_directory
         self.names_of_the_files_to_search_from = names_of_variables
         self.delimiter = delimiter
+        self.dtype = np.dtype(dtype)
+        self.manifest = DatasetManifest(path_to_a_directory, delimiter, shard).refresh()
+        self.cache = SignalCache(path_to_a_directory) if use_cache else None
+        # a shard only knows its own files, pruning would remove the sidecars of the other shards
+        if self.cache is not None and shard is None:
+            self.cache.prune(self.manifest)
         self.all_alaized_files_names = []
         self.all_alaized_names = []
-        self.signals = self.get_signals_from_files()
+        if lazy:
+            # names are known from the headers, signals are read on iteration
+            for file_name, names in self.manifest.matching(self.names_of_the_files_to_search_from):
+                self.all_alaized_files_names.extend([file_name] * len(names))
+                self.all_alaized_names.extend(names)
+            self.signals = None
+        else:
+            self.signals = self.get_signals_from_files()
 
     def get_all_csv_files(self):
         """get all csv files from the directory.
@@ -58,51 +97,113 @@ class PathHandler:
         csv_files = [file for file in all_files if file.endswith('.csv')]
 
         return csv_files
-    
+
     @staticmethod
-    def data_cleaner(list):
+    def data_cleaner(list, dtype=np.float64):
         """
         clean the data.
 
         Args:
-            list (int): list of data.
+            list (Series): column of data, numeric or strings with ',' as decimal separator.
+            dtype (numpy.dtype, optional): type of the returned array. Defaults to np.float64.
 
         Returns:
-            list: list of cleaned data.
+            ndarray: contiguous array of cleaned data.
         """
-        # Remove nan values from signal
-        list = list.dropna()
+        # Columns the parser could not read as numbers still hold ',' decimal strings
+        if list.dtype == object:
+            list = pd.to_numeric(list.str.replace(',', '.', regex=False), errors='coerce')
 
-        # Remove 0 values from signal and change ',' to '.' also change str to float
-        cleaned = [float(i.replace(',', '.')) for i in list if i != 0]
-        return cleaned
-    
-    def get_signals_from_files(self):
+        values = list.to_numpy(dtype=dtype)
+
+        # Remove nan and 0 values from signal
+        cleaned = values[~np.isnan(values) & (values != 0)]
+        return np.ascontiguousarray(cleaned)
+
+    def read_signal_columns(self, file_name, names=None):
         """
-        get the signals from the files.
+        read only the searched columns of a single csv file.
+
+        Args:
+            file_name (str): name of the csv file in the directory.
+            names (list, optional): columns to read. Defaults to all searched names.
+
+        Returns:
+            dict: column name -> raw pandas Series, only for the columns present in the file.
+        """
+        names = self.names_of_the_files_to_search_from if names is None else names
+        wanted = set(names)
+        delimiter = self.manifest.entries.get(file_name, {}).get("delimiter", self.delimiter)
+        frame = pd.read_csv(
+            fr"{self.path_to_a_directory}/{file_name}",
+            delimiter=delimiter,
+            decimal=',' if delimiter != ',' else '.',
+            usecols=lambda column: column in wanted,
+            engine='c',
+        )
+        return {name: frame[name] for name in names if name in frame.columns}
+
+    def load_signals(self, file_name, names):
+        """
+        get the cleaned signals of a single csv file, memory-mapped from the cache when possible.
+
+        Args:
+            file_name (str): name of the csv file in the directory.
+            names (list): columns present in the file.
 
         Returns:
-           DataFrame: pandas dataframe of all signals.
+            dict: column name -> cleaned signal.
+        """
+        if self.cache is None:
+            return {name: PathHandler.data_cleaner(column, self.dtype)
+                    for name, column in self.read_signal_columns(file_name, names).items()}
+
+        file_hash = self.manifest.entries[file_name]["hash"]
+        params = {"dtype": self.dtype.str, "cleaner": self.CLEANER_VERSION}
+        loaded = {name: self.cache.get(file_name, name, file_hash, params) for name in names}
+
+        missing = [name for name, signal in loaded.items() if signal is None]
+        if missing:
+            for name, column in self.read_signal_columns(file_name, missing).items():
+                loaded[name] = PathHandler.data_cleaner(column, self.dtype)
+                self.cache.put(file_name, name, file_hash, params, loaded[name])
+        return {name: signal for name, signal in loaded.items() if signal is not None}
+
+    def iter_signals(self, skip=None):
         """
+        yield the signals one file at a time, so only one file is held in memory.
 
-        # Get all csv files from the directory
-        csv_files = self.get_all_csv_files()
+        Args:
+            skip (callable, optional): skip(file name, column name) returns True for
+                signals that must not be loaded, e.g. ones with a stored result.
+
+        Yields:
+            tuple: (file name, column name, cleaned signal).
+        """
 
-        # Get signals from files
-        signals = {i:pd.read_csv(fr"{self.path_to_a_directory}/{i}", delimiter=self.delimiter)
-                   for i in csv_files}
+        # Only files whose header has a searched column are parsed
+        for file_name, names in self.manifest.matching(self.names_of_the_files_to_search_from):
+            if skip is not None:
+                names = [name for name in names if not skip(file_name, name)]
+                if not names:
+                    continue
+            for name, signal in self.load_signals(file_name, names).items():
+                yield file_name, name, signal
 
-        # Get signals from names
-        signal_from_names = []
-        for i,k in zip(signals.values(), signals.keys()):
-            for name in self.names_of_the_files_to_search_from:
-                if name in i.columns:
-                    signal_from_names.append(i[name])
-                    self.all_alaized_files_names.append(k)
-                    self.all_alaized_names.append(name)
+    def get_signals_from_files(self):
+        """
+        get the signals from the files.
+
+        Returns:
+           list: cleaned signals as numpy arrays.
+        """
 
-        # Clean the data
-        signal_from_names_cleared = [PathHandler.data_cleaner(i) for i in signal_from_names]
+        # Get signals from names, reading only the searched columns
+        signal_from_names_cleared = []
+        for file_name, name, signal in self.iter_signals():
+            signal_from_names_cleared.append(signal)
+            self.all_alaized_files_names.append(file_name)
+            self.all_alaized_names.append(name)
 
         # Return signals
         return signal_from_names_cleared
@@ -114,4 +215,4 @@ if __name__ == "__main__":
     ph = PathHandler(path, names)
     print(ph.signals)
     print(ph.all_alaized_files_names)
-    print(ph.all_alaized_names)
\ No newline at end of file
+    print(ph.all_alaized_names)
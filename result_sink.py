@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*
+import importlib.util
+import os
+
+import numpy as np
+
+from ABP.backends import lazy_import
+from ABP.batch_runner import metric_values
+from ABP.time_domain import TIME_DOMAIN_DTYPE
+
+pd = lazy_import("pandas")
+
+
+class ResultSink:
+    """
+    This class collects analysis results as typed rows and writes them in large batches.
+
+    Every metric gets its own column, so the output loads with pandas.read_csv
+    or pandas.read_parquet without parsing JSON. Rows are buffered column by
+    column and written every batch_size rows: a CSV file gets its header once
+    and is appended to, a Parquet file gets one row group per batch.
+
+    Attributes
+    ----------
+    path : str
+        The output file, ".parquet" writes Parquet (needs pyarrow), anything else CSV.
+    metrics : tuple
+        The metric columns, in order.
+    batch_size : int
+        The number of rows buffered before they are written.
+    rows_written : int
+        The number of rows written so far.
+
+    Methods
+    -------
+    add(result)
+        Buffers one result of analyze_signal.
+    add_row(file_name, column_name, values, errors)
+        Buffers one row of metric values, e.g. read back from a ResultStore.
+    flush()
+        Writes the buffered rows.
+    close()
+        Writes the remaining rows and closes the file, a run without rows
+        still writes the header.
+    """
+
+    KEY_COLUMNS = ("file_name", "column_name")
+    ERROR_COLUMN = "errors"
+    INTEGER_METRICS = tuple(name for name in TIME_DOMAIN_DTYPE.names if TIME_DOMAIN_DTYPE[name].kind == "i")
+    BATCH_SIZE = 10000
+
+    def __init__(self, path, metrics, batch_size=BATCH_SIZE):
+        """
+        Initialize the class.
+        Args:
+            path (str): the output file, ".parquet" for Parquet, otherwise CSV.
+            metrics (iterable of str): the metric columns.
+            batch_size (int): the number of rows buffered before they are written.
+
+        Returns:
+            None
+
+        Raises:
+            ImportError: if Parquet is requested and pyarrow is not installed.
+        """
+        self.path = path
+        self.metrics = tuple(metrics)
+        self.batch_size = int(batch_size)
+        self.rows_written = 0
+        self.parquet = os.path.splitext(path)[1].lower() == ".parquet"
+        self._writer = None
+        self._columns = {column: [] for column in self.KEY_COLUMNS + self.metrics + (self.ERROR_COLUMN,)}
+        # checked up front so a run fails before any signal is analyzed, pyarrow is imported by the first write
+        if self.parquet and importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("Writing Parquet needs pyarrow, use a .csv path instead.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._columns[self.ERROR_COLUMN])
+
+    def add(self, result):
+        """Buffer one result of analyze_signal and write the buffer once it is full.
+
+        Args:
+            result (dict): file_name, column_name, one dict of metrics per domain
+                (None on failure) and errors.
+
+        Returns:
+            None
+        """
+        values, errors = metric_values(result)
+        self.add_row(result["file_name"], result["column_name"], values, errors)
+
+    def add_row(self, file_name, column_name, values, errors=""):
+        """Buffer one row and write the buffer once it is full.
+
+        Args:
+            file_name (str): name of the csv file of the signal.
+            column_name (str): name of the column of the signal.
+            values (dict): metric name -> value, missing metrics are left empty.
+            errors (str, optional): the errors as "domain: message" joined by "; ".
+
+        Returns:
+            None
+        """
+        self._columns["file_name"].append(file_name)
+        self._columns["column_name"].append(column_name)
+        for metric in self.metrics:
+            self._columns[metric].append(values.get(metric))
+        self._columns[self.ERROR_COLUMN].append(errors)
+        if len(self) >= self.batch_size:
+            self.flush()
+
+    def _frame(self):
+        """Build the typed data frame of the buffered rows.
+
+        Returns:
+            DataFrame: string keys, nullable integer counts and float metrics.
+        """
+        frame = pd.DataFrame({column: pd.Series(values, dtype="string")
+                              for column, values in self._columns.items()
+                              if column in self.KEY_COLUMNS or column == self.ERROR_COLUMN})
+        for metric in self.metrics:
+            values = np.array(self._columns[metric], dtype=np.float64)
+            frame[metric] = pd.array(values, dtype="Int64") if metric in self.INTEGER_METRICS else values
+        return frame[list(self._columns)]
+
+    def flush(self):
+        """Write the buffered rows.
+
+        Returns:
+            None
+        """
+        if not len(self):
+            return
+        self._write(self._frame())
+        for values in self._columns.values():
+            values.clear()
+
+    def _write(self, frame):
+        """Append a data frame to the output, creating the file on the first call.
+
+        Args:
+            frame (DataFrame): rows built by _frame().
+
+        Returns:
+            None
+        """
+        if self.parquet:
+            import pyarrow
+            import pyarrow.parquet
+
+            table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            frame.to_csv(self.path, mode="w" if self.rows_written == 0 else "a",
+                         header=self.rows_written == 0, index=False)
+        self.rows_written += len(frame)
+
+    def close(self):
+        """Write the remaining rows and close the file.
+
+        Returns:
+            None
+        """
+        self.flush()
+        if self.rows_written == 0 and self._writer is None:
+            # a run without rows (e.g. an empty shard) still leaves a file with the columns
+            self._write(self._frame())
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
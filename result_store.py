@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*
+import hashlib
+import json
+import sqlite3
+import time
+
+from ABP.backends import lazy_import
+from ABP.batch_runner import metric_values
+from ABP.frequency_domain import FrequencyDomain
+from ABP.intermediate_cache import IntermediateCache
+from ABP.time_domain import TIME_DOMAIN_DTYPE, TimeDomain
+
+pd = lazy_import("pandas")
+
+
+class ResultStore:
+    """
+    This class keeps analysis results in a local SQLite database across runs.
+
+    There is one row per file, column, parameter set and code version, with one
+    indexed column per metric, so questions like "which files have LFHF > 2"
+    are a single query. computed() tells a batch run which signals already have
+    a current row, so only new or changed recordings are analyzed.
+
+    Attributes
+    ----------
+    path : str
+        The database file.
+    batch_size : int
+        The number of rows buffered before they are committed.
+
+    Methods
+    -------
+    params_key(params)
+        Hashes a parameter set.
+    computed(params)
+        Returns the signals with a successful row for the parameters.
+    results(params)
+        Returns the stored metric values for the parameters.
+    add(result, params, file_hash)
+        Buffers one result of analyze_signal.
+    flush()
+        Commits the buffered rows.
+    query(condition, arguments, params)
+        Returns the matching rows as a data frame.
+    close()
+        Commits the remaining rows and closes the database.
+    """
+
+    # one version for cached intermediates and stored results, bumping it after a
+    # change of the preprocessing or a detector also recomputes the stored results
+    CODE_VERSION = IntermediateCache.CODE_VERSION
+    TABLE = "results"
+    METRICS = TimeDomain.METRICS + FrequencyDomain.METRICS
+    BATCH_SIZE = 500
+
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        """
+        Initialize the class.
+        Args:
+            path (str): the database file, created if missing.
+            batch_size (int): the number of rows buffered before they are committed.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.batch_size = int(batch_size)
+        self._rows = []
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self._create()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _type(metric):
+        if metric in TIME_DOMAIN_DTYPE.names and TIME_DOMAIN_DTYPE[metric].kind == "i":
+            return "INTEGER"
+        return "REAL"
+
+    def _create(self):
+        """create the table and the metric indexes, adding metric columns missing from an older database.
+
+        Returns:
+            None
+        """
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+                "file_name TEXT NOT NULL, column_name TEXT NOT NULL, params_key TEXT NOT NULL, "
+                "code_version INTEGER NOT NULL, file_hash TEXT, params TEXT NOT NULL, "
+                "computed_at REAL NOT NULL, errors TEXT NOT NULL, "
+                "PRIMARY KEY (file_name, column_name, params_key, code_version))"
+            )
+            existing = {row[1] for row in self.connection.execute(f"PRAGMA table_info({self.TABLE})")}
+            for metric in self.METRICS:
+                if metric not in existing:
+                    self.connection.execute(f'ALTER TABLE {self.TABLE} ADD COLUMN "{metric}" {self._type(metric)}')
+                self.connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{self.TABLE}_{metric}" ON {self.TABLE} ("{metric}")')
+
+    @staticmethod
+    def params_key(params):
+        """hash a parameter set.
+
+        Args:
+            params (dict): the analysis parameters, JSON serializable.
+
+        Returns:
+            str: short hex digest, independent of the key order.
+        """
+        return hashlib.blake2b(json.dumps(params, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+
+    def computed(self, params):
+        """return the signals with a successful row for the parameters and the current code version.
+
+        Args:
+            params (dict): the analysis parameters.
+
+        Returns:
+            dict: (file name, column name) -> content hash of the file when it was analyzed.
+        """
+        self.flush()
+        rows = self.connection.execute(
+            f"SELECT file_name, column_name, file_hash FROM {self.TABLE} "
+            "WHERE params_key = ? AND code_version = ? AND errors = ''",
+            (self.params_key(params), self.CODE_VERSION),
+        )
+        return {(file_name, column_name): file_hash for file_name, column_name, file_hash in rows}
+
+    def results(self, params):
+        """return the stored rows of the parameters and the current code version.
+
+        Args:
+            params (dict): the analysis parameters.
+
+        Returns:
+            dict: (file name, column name) -> (metric name -> value, errors).
+        """
+        self.flush()
+        metrics = ", ".join(f'"{metric}"' for metric in self.METRICS)
+        rows = self.connection.execute(
+            f"SELECT file_name, column_name, errors, {metrics} FROM {self.TABLE} "
+            "WHERE params_key = ? AND code_version = ?",
+            (self.params_key(params), self.CODE_VERSION),
+        )
+        return {(file_name, column_name): (dict(zip(self.METRICS, values)), errors)
+                for file_name, column_name, errors, *values in rows}
+
+    def add(self, result, params, file_hash=None):
+        """buffer one result of analyze_signal, replacing an older row of the same signal.
+
+        Args:
+            result (dict): file_name, column_name, one dict of metrics per domain
+                (None on failure) and errors.
+            params (dict): the analysis parameters.
+            file_hash (str, optional): content hash of the file of the signal.
+
+        Returns:
+            None
+        """
+        values, errors = metric_values(result)
+        self._rows.append((
+            result["file_name"], result["column_name"], self.params_key(params), self.CODE_VERSION, file_hash,
+            json.dumps(params, sort_keys=True), time.time(), errors,
+            *(values.get(metric) for metric in self.METRICS),
+        ))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """commit the buffered rows.
+
+        Returns:
+            None
+        """
+        if not self._rows:
+            return
+        columns = ["file_name", "column_name", "params_key", "code_version", "file_hash", "params",
+                   "computed_at", "errors"] + [f'"{metric}"' for metric in self.METRICS]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO {self.TABLE} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                self._rows,
+            )
+        self._rows.clear()
+
+    def query(self, condition="1", arguments=(), params=None):
+        """return the rows of the current code version matching an SQL condition.
+
+        Args:
+            condition (str): WHERE clause over the metric columns, e.g. "LFHF > ?".
+            arguments (tuple): values of the placeholders of the condition.
+            params (dict, optional): only rows computed with these parameters.
+
+        Returns:
+            DataFrame: one row per signal, one column per metric.
+        """
+        self.flush()
+        sql = f"SELECT * FROM {self.TABLE} WHERE code_version = ? AND ({condition})"
+        arguments = (self.CODE_VERSION, *arguments)
+        if params is not None:
+            sql += " AND params_key = ?"
+            arguments += (self.params_key(params),)
+        return pd.read_sql_query(sql, self.connection, params=arguments)
+
+    def close(self):
+        """commit the remaining rows and close the database.
+
+        Returns:
+            None
+        """
+        self.flush()
+        self.connection.close()
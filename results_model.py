@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*
+import math
+
+import numpy as np
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from ABP.backends import lazy_import
+from ABP.batch_runner import metric_values
+from ABP.frequency_domain import FrequencyDomain
+from ABP.time_domain import TimeDomain
+from result_sink import ResultSink
+
+pd = lazy_import("pandas")
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """
+    This class holds the analysis results shown in the results table, one row per signal.
+
+    Rows are kept as plain tuples and appended with beginInsertRows, so adding
+    a result only tells the view about the new rows; a QTableView only asks
+    data() for the cells on screen, which keeps it smooth with tens of
+    thousands of rows. The metric columns follow the analyzed domains.
+
+    Attributes
+    ----------
+    metrics : tuple
+        The metric columns, in order.
+
+    Methods
+    -------
+    set_domains(domains)
+        Removes every row and shows the metrics of the domains.
+    append(results)
+        Appends results of analyze_signal.
+    to_frame()
+        Returns the rows as a typed data frame.
+    to_csv(path)
+        Writes the rows to a CSV file.
+    """
+
+    KEY_COLUMNS = ResultSink.KEY_COLUMNS
+    ERROR_COLUMN = ResultSink.ERROR_COLUMN
+    DOMAIN_METRICS = {"time": TimeDomain.METRICS, "frequency": FrequencyDomain.METRICS}
+
+    def __init__(self, domains=("time",), parent=None):
+        """
+        Parameters
+        ----------
+        domains : tuple
+            Any of "time" and "frequency".
+        parent : QObject, optional
+            (Default value = None)
+
+        Returns
+        -------
+        None
+        """
+        super().__init__(parent)
+        self._rows = []
+        self.metrics = self._metrics(domains)
+        self._columns = self.KEY_COLUMNS + self.metrics + (self.ERROR_COLUMN,)
+
+    def _metrics(self, domains):
+        return tuple(metric for domain in self.DOMAIN_METRICS if domain in domains
+                     for metric in self.DOMAIN_METRICS[domain])
+
+    def set_domains(self, domains):
+        """
+        Removes every row and shows the metrics of the domains.
+
+        Parameters
+        ----------
+        domains : tuple
+            Any of "time" and "frequency".
+
+        Returns
+        -------
+        None
+        """
+        self.beginResetModel()
+        self._rows = []
+        self.metrics = self._metrics(domains)
+        self._columns = self.KEY_COLUMNS + self.metrics + (self.ERROR_COLUMN,)
+        self.endResetModel()
+
+    def append(self, results):
+        """
+        Appends results of analyze_signal at the end of the table.
+
+        Parameters
+        ----------
+        results : list of dict
+            file_name, column_name, one dict of metrics per domain (None on failure) and errors.
+
+        Returns
+        -------
+        None
+        """
+        rows = []
+        for result in results:
+            values, errors = metric_values(result)
+            rows.append((result["file_name"], result["column_name"],
+                         *(values.get(metric) for metric in self.metrics), errors))
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self._rows[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                return ""
+            if isinstance(value, float):
+                return f"{value:.4f}"
+            return str(value)
+        if role == Qt.ToolTipRole and self._columns[index.column()] in self.KEY_COLUMNS + (self.ERROR_COLUMN,):
+            return value or None
+        if role == Qt.TextAlignmentRole and self._columns[index.column()] in self.metrics:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._columns[section]
+        return str(section + 1)
+
+    def to_frame(self):
+        """
+        Returns the rows as a data frame with the columns of ResultSink.
+
+        Returns
+        -------
+        DataFrame: string keys, nullable integer counts and float metrics.
+        """
+        columns = list(zip(*self._rows)) if self._rows else [()] * len(self._columns)
+        frame = pd.DataFrame({column: pd.Series(values, dtype="string")
+                              for column, values in zip(self._columns, columns)
+                              if column in self.KEY_COLUMNS or column == self.ERROR_COLUMN})
+        for column, values in zip(self._columns, columns):
+            if column in self.metrics:
+                values = np.array(values, dtype=np.float64)
+                frame[column] = pd.array(values, dtype="Int64") if column in ResultSink.INTEGER_METRICS else values
+        return frame[list(self._columns)]
+
+    def to_csv(self, path):
+        """
+        Writes the rows to a CSV file.
+
+        Parameters
+        ----------
+        path : str
+            The output file.
+
+        Returns
+        -------
+        None
+        """
+        self.to_frame().to_csv(path, index=False)
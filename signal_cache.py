@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+class SignalCache:
+    """
+    This class stores cleaned signal columns as .npy sidecars next to the raw csv files.
+
+    Each sidecar is keyed by the content hash of its csv file and the cleaning
+    parameters, so an edited csv or changed cleaning simply misses the cache and
+    the outdated sidecar is removed when the new one is written.
+
+    Attributes
+    ----------
+    cache_directory : str
+        The directory with the sidecar files.
+
+    Methods
+    -------
+    get(file_name, column, file_hash, params)
+        Returns the memory-mapped signal or None.
+    put(file_name, column, file_hash, params, signal)
+        Stores the signal and removes outdated sidecars of the same column.
+    prune(manifest)
+        Removes sidecars of csv files or columns that no longer exist.
+    """
+
+    DIRECTORY_NAME = ".signal_cache"
+
+    def __init__(self, path_to_a_directory):
+        """
+        Initialize the class.
+        Args:
+            path_to_a_directory (rawstring): path to the directory with the data.
+
+        Returns:
+            None
+        """
+        self.cache_directory = os.path.join(path_to_a_directory, self.DIRECTORY_NAME)
+
+    @staticmethod
+    def _digest(*parts):
+        """hash the given parts.
+
+        Returns:
+            str: short hex digest.
+        """
+        return hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+    def _prefix(self, file_name, column):
+        return self._digest(file_name, column)
+
+    def _path(self, file_name, column, file_hash, params):
+        key = self._digest(file_hash, json.dumps(params, sort_keys=True))
+        return os.path.join(self.cache_directory, f"{self._prefix(file_name, column)}-{key}.npy")
+
+    def get(self, file_name, column, file_hash, params):
+        """get the cached signal.
+
+        Args:
+            file_name (str): name of the csv file.
+            column (str): name of the column.
+            file_hash (str): content hash of the csv file.
+            params (dict): cleaning parameters.
+
+        Returns:
+            numpy.memmap: read-only memory-mapped signal or None on a miss.
+        """
+        try:
+            return np.load(self._path(file_name, column, file_hash, params), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def put(self, file_name, column, file_hash, params, signal):
+        """store the signal and remove outdated sidecars of the same column.
+
+        Args:
+            file_name (str): name of the csv file.
+            column (str): name of the column.
+            file_hash (str): content hash of the csv file.
+            params (dict): cleaning parameters.
+            signal (ndarray): cleaned signal.
+
+        Returns:
+            None
+        """
+        path = self._path(file_name, column, file_hash, params)
+        try:
+            os.makedirs(self.cache_directory, exist_ok=True)
+            for stale in glob.glob(os.path.join(self.cache_directory, f"{self._prefix(file_name, column)}-*.npy")):
+                if stale != path:
+                    os.remove(stale)
+            temporary = path + ".tmp"
+            with open(temporary, "wb") as f:
+                np.save(f, np.ascontiguousarray(signal))
+            os.replace(temporary, path)
+        except OSError:
+            # caching is best effort, a read-only directory just never hits
+            pass
+
+    def prune(self, manifest):
+        """remove sidecars of csv files or columns that are no longer in the manifest.
+
+        Args:
+            manifest (DatasetManifest): refreshed manifest of the directory.
+
+        Returns:
+            None
+        """
+        live = {self._prefix(file_name, column)
+                for file_name, entry in manifest.entries.items()
+                for column in entry["columns"]}
+        for path in glob.glob(os.path.join(self.cache_directory, "*.npy")):
+            if os.path.basename(path).split("-")[0] not in live:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -17,9 +17,9 @@ from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
     QPainter, QPalette, QPixmap, QRadialGradient,
     QTransform)
 from PySide6.QtWidgets import (QApplication, QCheckBox, QLabel, QMainWindow,
-    QMenu, QMenuBar, QPlainTextEdit, QPushButton,
-    QScrollArea, QSizePolicy, QStatusBar, QTextEdit,
-    QWidget)
+    QAbstractItemView, QHeaderView, QMenu, QMenuBar, QPlainTextEdit,
+    QProgressBar, QPushButton, QScrollArea, QSizePolicy, QStatusBar,
+    QTableView, QTextEdit, QWidget)
 
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
@@ -51,12 +51,23 @@ class Ui_MainWindow(object):
 
         self.scrollArea = QScrollArea(self.centralwidget)
         self.scrollArea.setObjectName(u"scrollArea")
-        self.scrollArea.setGeometry(QRect(30, 330, 731, 381))
+        self.scrollArea.setGeometry(QRect(30, 330, 731, 61))
         self.scrollArea.setWidgetResizable(True)
         self.scrollAreaWidgetContents = QWidget()
         self.scrollAreaWidgetContents.setObjectName(u"scrollAreaWidgetContents")
-        self.scrollAreaWidgetContents.setGeometry(QRect(0, 0, 729, 379))
+        self.scrollAreaWidgetContents.setGeometry(QRect(0, 0, 729, 59))
         self.scrollArea.setWidget(self.scrollAreaWidgetContents)
+        self.resultsTable = QTableView(self.centralwidget)
+        self.resultsTable.setObjectName(u"resultsTable")
+        self.resultsTable.setGeometry(QRect(30, 400, 731, 311))
+        self.resultsTable.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.resultsTable.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.resultsTable.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        # fixed section sizes, so the view never measures rows that are off screen
+        self.resultsTable.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.resultsTable.verticalHeader().setDefaultSectionSize(22)
+        self.resultsTable.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.resultsTable.horizontalHeader().setDefaultSectionSize(90)
         self.plainTextEdit = QPlainTextEdit(self.centralwidget)
         self.plainTextEdit.setObjectName(u"plainTextEdit")
         self.plainTextEdit.setGeometry(QRect(370, 80, 391, 221))
@@ -99,7 +110,16 @@ class Ui_MainWindow(object):
         self.overlapTxt.setGeometry(QRect(30, 190, 101, 16))
         self.analyze_button = QPushButton(self.centralwidget)
         self.analyze_button.setObjectName(u"pushButton")
-        self.analyze_button.setGeometry(QRect(30, 250, 321, 51))
+        self.analyze_button.setGeometry(QRect(30, 250, 211, 51))
+        self.cancel_button = QPushButton(self.centralwidget)
+        self.cancel_button.setObjectName(u"cancel_button")
+        self.cancel_button.setGeometry(QRect(250, 250, 101, 51))
+        self.cancel_button.setEnabled(False)
+        self.progressBar = QProgressBar(self.centralwidget)
+        self.progressBar.setObjectName(u"progressBar")
+        self.progressBar.setGeometry(QRect(30, 308, 731, 16))
+        self.progressBar.setValue(0)
+        self.progressBar.setTextVisible(False)
         MainWindow.setCentralWidget(self.centralwidget)
         self.menubar = QMenuBar(MainWindow)
         self.menubar.setObjectName(u"menubar")
@@ -194,6 +214,30 @@ class Ui_MainWindow(object):
         border-radius: 10px;
         """)
 
+        self.cancel_button.setFont(font1)
+        self.cancel_button.setStyleSheet("""
+        QPushButton {
+            background-color: #2D3235;
+            color: #DDDDDD;
+            border: 1px solid;
+            border-radius: 10px;
+        }
+        QPushButton:disabled {
+            color: #565C63;
+        }
+        """)
+
+        self.progressBar.setStyleSheet("""
+            QProgressBar {
+                background-color: #17191B;
+                border: 1px solid #565C63;
+                border-radius: 4px;
+            }
+            QProgressBar::chunk {
+                background-color: #00ff00;
+            }
+        """)
+
         font = QFont("Cascadia Code")
         font1.setPointSize(12)
 
@@ -258,6 +302,23 @@ class Ui_MainWindow(object):
 
         self.scrollArea.setStyleSheet("background-color: #17191B;")
 
+        self.resultsTable.setStyleSheet("""
+                   QTableView {
+                       background-color: #17191B;
+                       alternate-background-color: #1E2123;
+                       color: #DDDDDD;
+                       gridline-color: #2B2F31;
+                       selection-background-color: #2B2F31;
+                   }
+                   QHeaderView::section {
+                       background-color: #1E2123;
+                       color: #00ff00;
+                       border: none;
+                       padding: 2px;
+                   }
+               """)
+        self.resultsTable.setAlternatingRowColors(True)
+
         self.title.setStyleSheet("color: #00ff00;")
 
         QMetaObject.connectSlotsByName(MainWindow)
@@ -279,6 +340,7 @@ class Ui_MainWindow(object):
         self.windowSize.setText(QCoreApplication.translate("MainWindow", u"Window size", None))
         self.overlapTxt.setText(QCoreApplication.translate("MainWindow", u"Overlap", None))
         self.analyze_button.setText(QCoreApplication.translate("MainWindow", u"Analize", None))
+        self.cancel_button.setText(QCoreApplication.translate("MainWindow", u"Cancel", None))
         self.menuAnalize.setTitle(QCoreApplication.translate("MainWindow", u"Analize", None))
         self.menuHow_to_use.setTitle(QCoreApplication.translate("MainWindow", u"How to use", None))
     # retranslateUi